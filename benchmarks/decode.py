@@ -0,0 +1,115 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+"""
+Result decoding of wide numeric results:
+
+    python benchmarks/decode.py [--rows 100000] [--columns 20]
+
+The rows of a synthetic result (as pyignite decodes them) are
+processed with the SQLAlchemy result processors of the column
+types that the dialect reflects. Each Java type is compared with
+the SQL type it was mapped to before, by a dialect without native
+decimal support (java.lang.Double was mapped to DECIMAL, i.e.
+every float value was converted to decimal.Decimal).
+"""
+
+import argparse
+import decimal
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlalchemy import types as sqltypes  # noqa: E402
+from sqlalchemy.engine.default import DefaultDialect  # noqa: E402
+
+from igniteworks.sqlalchemy.dialect import IgniteDialect, _resolve_type  # noqa: E402
+
+"""Java type -> (value factory, previous SQL type)"""
+CASES = {
+    "java.lang.Double": (lambda i: i * 1.25, sqltypes.DECIMAL),
+    "java.lang.Float": (lambda i: i * 0.5, sqltypes.Float),
+    "java.math.BigDecimal": (lambda i: decimal.Decimal(i) / 4, sqltypes.DECIMAL),
+}
+
+
+def _processor(type_, dialect):
+
+    if isinstance(type_, type):
+        type_ = type_()
+    return type_.result_processor(dialect, None)
+
+
+def decode(rows, processor):
+    """
+    Process all values of the rows column by column, as the
+    result of an SQLAlchemy query does
+    """
+    if processor is None:
+        return [tuple(row) for row in rows]
+
+    return [tuple(processor(value) for value in row) for row in rows]
+
+
+def measure(rows, processor, repeat=3):
+    """
+    Returns (best seconds, retained MiB) of decoding the rows; the
+    memory is traced in a separate run
+    """
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decode(rows, processor)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    tracemalloc.start()
+    decoded = decode(rows, processor)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del decoded
+    return seconds, retained / 2 ** 20
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark the result decoding of numeric types")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=20)
+    options = parser.parse_args(argv)
+
+    dialect = IgniteDialect()
+    previous_dialect = DefaultDialect()
+
+    print("{0:<22} {1:<10} {2:>9} {3:>9}".format("java type", "mapping", "seconds", "MiB"))
+    for java_type, (factory, previous) in CASES.items():
+        rows = [[factory(i + j) for j in range(options.columns)] for i in range(options.rows)]
+
+        for label, processor in [("before", _processor(previous, previous_dialect)),
+                                 ("now", _processor(_resolve_type(java_type), dialect))]:
+            seconds, allocated = measure(rows, processor)
+            print("{0:<22} {1:<10} {2:>9.3f} {3:>9.1f}".format(java_type, label, seconds, allocated))
+
+
+if __name__ == "__main__":
+    main()
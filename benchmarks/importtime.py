@@ -0,0 +1,101 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+"""
+Import-time check of the DB-API module:
+
+    python benchmarks/importtime.py [--budget-ms 75] [--runs 5]
+
+`import igniteworks.client` is timed with `python -X importtime`
+in fresh interpreters; the best cumulative time of all runs must
+stay within the budget, and neither pyignite nor SQLAlchemy may be
+imported. The exit status is 1 if the check fails, so the script
+can be used as a CI gate.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+MODULE = "igniteworks.client"
+"""Packages that must be imported lazily"""
+LAZY = ("pyignite", "sqlalchemy")
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def measure():
+    """
+    Import the module in a fresh interpreter; returns the
+    cumulative import time (ms) and the lazy packages that have
+    been imported nevertheless
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC + os.pathsep + env.get("PYTHONPATH", "")
+
+    code = "import sys, {0}; print(' '.join(sys.modules))".format(MODULE)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                             env=env, capture_output=True, text=True, check=True)
+
+    cumulative = None
+    for line in process.stderr.splitlines():
+        """import time: self [us] | cumulative | imported package"""
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == MODULE:
+            cumulative = int(fields[1]) / 1000.0
+
+    if cumulative is None:
+        raise RuntimeError("No import time reported for " + MODULE)
+
+    imported = [name for name in process.stdout.split() if name.split(".")[0] in LAZY]
+    return cumulative, sorted({name.split(".")[0] for name in imported})
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Check the import time of " + MODULE)
+    parser.add_argument("--budget-ms", type=float, default=75.0)
+    parser.add_argument("--runs", type=int, default=5)
+    options = parser.parse_args(argv)
+
+    timings = []
+    eager = set()
+    for _ in range(options.runs):
+        cumulative, imported = measure()
+        timings.append(cumulative)
+        eager.update(imported)
+
+    best = min(timings)
+    print("{0}: best {1:.1f} ms of {2} runs (budget {3:.1f} ms)".format(
+        MODULE, best, options.runs, options.budget_ms))
+
+    failed = False
+    if best > options.budget_ms:
+        print("FAIL: import time exceeds the budget")
+        failed = True
+    if eager:
+        print("FAIL: imported eagerly: " + ", ".join(sorted(eager)))
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+"""
+Memory and throughput of the result row containers of a Cursor:
+
+    python benchmarks/rows.py [--rows 1000000] [--spill-threshold 100000]
+
+Each container is filled with the rows of a synthetic four-column
+result (as pyignite provides them: one list per row) and read with
+`Cursor.fetchall`. The containers are
+
+    lists       the pyignite rows as they are (previous behavior)
+    tuples      the rows converted to tuples (default)
+    rowbuffer   a RowBuffer that spills the rows beyond the spill
+                threshold to a temporary file
+
+The retained memory is measured with tracemalloc; a spilled
+RowBuffer retains only its in-memory rows and the page index.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from igniteworks.client.buffer import RowBuffer  # noqa: E402
+from igniteworks.client.cursor import Cursor  # noqa: E402
+
+
+class _Connection(object):
+    """
+    The part of a Connection that is used to read a result
+    """
+    _profile = None
+    _profile_memory = None
+
+    def is_closed(self):
+        return False
+
+
+def _source(count):
+    return ([i, "name%d" % i, i * 1.5, i % 7] for i in range(count))
+
+
+def _lists(rows):
+    return list(rows)
+
+
+def _tuples(rows):
+    return list(map(tuple, rows))
+
+
+def _row_buffer(spill_threshold):
+
+    def build(rows):
+        buffer = RowBuffer(spill_threshold)
+        buffer.extend(map(tuple, rows))
+        return buffer.seal()
+
+    return build
+
+
+def measure(label, build, count):
+    """
+    Fill a container and fetch all rows through a Cursor; returns
+    (label, fill seconds, fetch seconds, retained MiB, peak MiB)
+    """
+    gc.collect()
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    rows = build(_source(count))
+    filled = time.perf_counter()
+    retained = tracemalloc.get_traced_memory()[0]
+
+    cursor = Cursor(_Connection())
+    cursor._set_result({"cols": ["ID", "NAME", "VALUE", "GROUP"], "rows": rows})
+    fetched = cursor.fetchall()
+    end = time.perf_counter()
+
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert len(fetched) == count
+    cursor.close()
+
+    return label, filled - start, end - filled, retained / 2 ** 20, peak / 2 ** 20
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark the result row containers")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--spill-threshold", type=int, default=100000)
+    options = parser.parse_args(argv)
+
+    print("{0:<10} {1:>9} {2:>9} {3:>13} {4:>9}".format(
+        "container", "fill s", "fetch s", "retained MiB", "peak MiB"))
+
+    for label, build in [("lists", _lists),
+                         ("tuples", _tuples),
+                         ("rowbuffer", _row_buffer(options.spill_threshold))]:
+        print("{0:<10} {1:>9.3f} {2:>9.3f} {3:>13.1f} {4:>9.1f}".format(
+            *measure(label, build, options.rows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -31,7 +31,9 @@ setup(
     package_dir={'': 'src'},
     zip_safe=False,
     install_requires=[
-        "pyignite>=0.5.2",
+        # node-aware routing relies on pyignite internals (SqlFieldsCursor,
+        # get_best_node, Client._nodes), tested with 0.6.x
+        "pyignite>=0.6.1,<0.7",
         "sqlalchemy>=1.2.0"
     ],
     extras_require={
@@ -58,6 +60,9 @@ setup(
     entry_points={
         "sqlalchemy.dialects": [
             "igniteworks = igniteworks.sqlalchemy.dialect:IgniteDialect"
+        ],
+        "console_scripts": [
+            "igniteworks-bench = igniteworks.bench:main"
         ]
     },
 )
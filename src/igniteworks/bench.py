@@ -0,0 +1,432 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import argparse
+import itertools
+import json
+import math
+import re
+import sys
+import threading
+import time
+
+from collections import Counter
+
+"""
+Workload replay and load test of the Apache Ignite DB-API and
+SQLAlchemy dialect:
+
+igniteworks-bench <workload> --target <servers or URL> --workers 16 --mode thread
+
+The workload is a JSON lines file with one statement per line,
+
+{"sql": "SELECT * FROM t WHERE id = %s", "parameters": [1]}
+
+e.g. the records of the `igniteworks.slowlog` logger or of the
+statement profiler; lines that are not JSON are replayed as plain
+SQL statements. Parameters that are a list of parameter sets (the
+slow log records of `executemany`) are replayed with `executemany`.
+Profiler records carry no parameters; statements with placeholders
+but without parameters cannot be replayed and are skipped.
+
+The target is either a list of servers (host:port, ...), which is
+connected with a shared DB-API connection, or an SQLAlchemy URL
+(igniteworks://host:port), where each statement checks out a
+pooled connection.
+
+The statements are replayed by N threads, processes or asyncio
+tasks, and the throughput, latency percentiles and the number of
+connections and errors are reported.
+"""
+
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|\?")
+
+
+def _has_placeholders(sql):
+
+    return _PLACEHOLDER.search(_LITERAL.sub("", sql)) is not None
+
+
+def _is_many(parameters):
+    """
+    Check whether parameters are a list of parameter sets
+    """
+    return isinstance(parameters, list) and len(parameters) > 0 and \
+        all(isinstance(item, (list, tuple, dict)) for item in parameters)
+
+
+def load_workload(path):
+    """
+    Read the (sql, parameters, many) statements of a workload file;
+    returns the statements and the skipped SQL statements, i.e.
+    those with placeholders but without parameters
+    """
+    workload = []
+    skipped = []
+    with (sys.stdin if path == "-" else open(path, "r", encoding="utf-8")) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {"sql": line}
+
+            if not isinstance(record, dict) or not record.get("sql"):
+                continue
+
+            sql, parameters = record["sql"], record.get("parameters")
+            if parameters is None and _has_placeholders(sql):
+                skipped.append(sql)
+                continue
+
+            workload.append((sql, parameters, _is_many(parameters)))
+
+    return workload, skipped
+
+
+def percentile(values, p):
+    """
+    The nearest-rank percentile of sorted values
+    """
+    if not values:
+        return None
+
+    rank = max(0, min(len(values) - 1, int(math.ceil(p / 100.0 * len(values))) - 1))
+    return values[rank]
+
+
+class Target(object):
+    """
+    The statement executor of a replay worker process
+    """
+
+    def __init__(self, target, options=None):
+
+        self.target = target
+        self.options = options or {}
+
+        self.connections = 0
+        self._lock = threading.Lock()
+
+        self._engine = None
+        self._connection = None
+
+        if "://" in target:
+            from sqlalchemy import create_engine, event
+
+            self._engine = create_engine(target, connect_args=self.options)
+            event.listen(self._engine, "connect", self._connected)
+
+        else:
+            import igniteworks.client as dbapi
+
+            self._connection = dbapi.connect(servers=target, **self.options)
+            self.connections = 1
+
+    def _connected(self, *args):
+
+        with self._lock:
+            self.connections += 1
+
+    def execute(self, sql, parameters, many=False):
+        """
+        Execute a statement (or a statement for a list of parameter
+        sets) and fetch its complete result
+        """
+        if self._engine is not None:
+            connection = self._engine.raw_connection()
+        else:
+            connection = self._connection
+
+        try:
+            cursor = connection.cursor()
+            try:
+                if many:
+                    cursor.executemany(sql, parameters)
+                else:
+                    cursor.execute(sql, parameters)
+                    if cursor.description:
+                        cursor.fetchall()
+            finally:
+                cursor.close()
+
+        finally:
+            if self._engine is not None:
+                connection.close()
+
+    def close(self):
+
+        if self._engine is not None:
+            self._engine.dispose()
+        if self._connection is not None:
+            self._connection.close()
+
+
+class Recorder(object):
+    """
+    Latencies and errors of the replayed statements
+    """
+
+    def __init__(self):
+
+        self.latencies = []
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def run(self, target, sql, parameters, many=False):
+
+        start = time.perf_counter()
+        try:
+            target.execute(sql, parameters, many)
+            error = None
+        except Exception as e:
+            error = type(e).__name__
+
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(latency)
+            if error is not None:
+                self.errors[error] += 1
+
+
+def _statements(workload, iterations, duration):
+    """
+    The statements to replay: the workload is repeated for a
+    number of iterations or until the duration has expired
+    """
+    if duration:
+        deadline = time.monotonic() + duration
+        for statement in itertools.cycle(workload):
+            if time.monotonic() >= deadline:
+                return
+            yield statement
+    else:
+        for _ in range(iterations):
+            yield from workload
+
+
+def _run_threads(target, workload, workers, iterations, duration):
+
+    recorder = Recorder()
+
+    statements = _statements(workload, iterations, duration)
+    statements_lock = threading.Lock()
+
+    def work():
+        while True:
+            with statements_lock:
+                statement = next(statements, None)
+            if statement is None:
+                return
+            recorder.run(target, *statement)
+
+    threads = [threading.Thread(target=work, name="igniteworks-bench-%d" % i) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return recorder
+
+
+def _run_async(target, workload, workers, iterations, duration):
+    """
+    The DB-API is synchronous; each asyncio task awaits the
+    statements that are executed by a thread pool
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    recorder = Recorder()
+    statements = _statements(workload, iterations, duration)
+
+    async def task(loop, executor):
+        for statement in statements:
+            await loop.run_in_executor(executor, recorder.run, target, *statement)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="igniteworks-bench") as executor:
+            await asyncio.gather(*[task(loop, executor) for _ in range(workers)])
+
+    asyncio.run(run())
+    return recorder
+
+
+def _run_process(args):
+    """
+    Replay the statements of a single worker process with its
+    own target
+    """
+    target_url, options, workload, iterations, duration = args
+
+    target = Target(target_url, options)
+    try:
+        recorder = _run_threads(target, workload, 1, iterations, duration)
+    finally:
+        target.close()
+
+    return recorder.latencies, dict(recorder.errors), target.connections
+
+
+def replay(target, workload, workers=1, mode="thread", iterations=1, duration=None, options=None):
+    """
+    Replay a workload and return the report as dictionary
+    """
+    start = time.perf_counter()
+
+    if mode == "process":
+        import multiprocessing
+
+        if duration:
+            """Each process replays the workload until the duration has expired"""
+            tasks = [(target, options, workload, 1, duration)] * workers
+        else:
+            """Each process replays its share of all statements"""
+            statements = list(workload) * iterations
+            tasks = [(target, options, statements[i::workers], 1, None)
+                     for i in range(min(workers, len(statements)))]
+
+        latencies, errors, connections = [], Counter(), 0
+        with multiprocessing.Pool(processes=len(tasks)) as pool:
+            for process_latencies, process_errors, process_connections in pool.map(_run_process, tasks):
+                latencies.extend(process_latencies)
+                errors.update(process_errors)
+                connections += process_connections
+
+    else:
+        executor = Target(target, options)
+        try:
+            run = _run_async if mode == "async" else _run_threads
+            recorder = run(executor, workload, workers, iterations, duration)
+        finally:
+            executor.close()
+
+        latencies, errors, connections = recorder.latencies, recorder.errors, executor.connections
+
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'mode': mode,
+        'workers': workers,
+        'statements': len(latencies),
+        'errors': sum(errors.values()),
+        'error_types': dict(errors),
+        'connections': connections,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p99': ms(percentile(latencies, 99)),
+            'p999': ms(percentile(latencies, 99.9)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def _format(report):
+
+    latency = report['latency_ms']
+    lines = [
+        "mode:         {0} x {1}".format(report['mode'], report['workers']),
+        "statements:   {0} in {1} s".format(report['statements'], report['elapsed_s']),
+        "throughput:   {0} statements/s".format(report['throughput_per_s']),
+        "latency (ms): mean {0}  p50 {1}  p99 {2}  p999 {3}  max {4}".format(
+            latency['mean'], latency['p50'], latency['p99'], latency['p999'], latency['max']),
+        "connections:  {0}".format(report['connections']),
+        "errors:       {0}".format(report['errors']),
+    ]
+    for error, count in sorted(report['error_types'].items()):
+        lines.append("    {0}: {1}".format(error, count))
+
+    return "\n".join(lines)
+
+
+def parse_option(option):
+    """
+    Parse a NAME=VALUE connection option; the value is decoded as
+    JSON (numbers, booleans, null, lists), or kept as string
+    """
+    name, _, value = option.partition("=")
+    value = value.strip()
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+
+    return name.strip(), value
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        prog="igniteworks-bench",
+        description="Replay a workload of SQL statements against Apache Ignite.")
+
+    parser.add_argument("workload",
+                        help="JSON lines file with 'sql' and 'parameters' per line ('-' for stdin)")
+    parser.add_argument("--target", default="127.0.0.1:10800",
+                        help="servers (host:port,...) or SQLAlchemy URL (igniteworks://host:port) "
+                             "of a running Apache Ignite cluster")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="number of concurrent threads, processes or tasks")
+    parser.add_argument("--mode", choices=("thread", "process", "async"), default="thread")
+    parser.add_argument("--iterations", type=int, default=1,
+                        help="number of times the workload is replayed")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="replay the workload repeatedly for this many seconds")
+    parser.add_argument("--option", action="append", default=[], metavar="NAME=VALUE",
+                        help="connection option, e.g. page_size=4096; the value is parsed "
+                             "as JSON if possible (repeatable)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    args = parser.parse_args(argv)
+
+    options = dict(parse_option(option) for option in args.option)
+
+    workload, skipped = load_workload(args.workload)
+    if skipped:
+        print("Skipped {0} statements with placeholders but without parameters "
+              "(e.g. profiler records)".format(len(skipped)), file=sys.stderr)
+    if not workload:
+        parser.error("The workload contains no statements.")
+
+    report = replay(args.target, workload,
+                    workers=max(1, args.workers),
+                    mode=args.mode,
+                    iterations=max(1, args.iterations),
+                    duration=args.duration,
+                    options=options)
+
+    print(json.dumps(report, indent=2) if args.json else _format(report))
+    return 1 if report['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
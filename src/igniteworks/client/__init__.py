@@ -16,10 +16,52 @@
 #
 # @author Stefan Krusche, Dr. Krusche & Partner PartG
 #
-from .exceptions import Error
+from .exceptions import (
+    Warning,
+    Error,
+    InterfaceError,
+    DatabaseError,
+    DataError,
+    OperationalError,
+    IntegrityError,
+    InternalError,
+    ProgrammingError,
+    NotSupportedError,
+    IgniteConnectionError,
+)
 from .connection import Connection as connect
-from igniteworks.sqlalchemy import dialect
 
+apilevel = '2.0'
+# Threads may share the module and connections; concurrent requests of
+# a connection are served by separate (pooled) Ignite Thin clients
+threadsafety = 2
 paramstyle = 'pyformat'  # Python extended format codes, e.g. ...WHERE name=%(name)s
 
-__all__ = [Error, connect, dialect, ]
+__all__ = [
+    'Warning',
+    'Error',
+    'InterfaceError',
+    'DatabaseError',
+    'DataError',
+    'OperationalError',
+    'IntegrityError',
+    'InternalError',
+    'ProgrammingError',
+    'NotSupportedError',
+    'IgniteConnectionError',
+    'connect',
+    'dialect',
+]
+
+
+def __getattr__(name):
+    """
+    The SQLAlchemy dialect (and SQLAlchemy itself) is imported
+    on first access only; processes that use the DB-API do not
+    pay for it at import time
+    """
+    if name == 'dialect':
+        from igniteworks.sqlalchemy import dialect
+        return dialect
+
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -0,0 +1,173 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import random
+import threading
+import time
+
+"""
+Latency-aware selection of the node that executes an SQL query
+without affinity key: such a query is mapped to all nodes, and
+the node it is sent to acts as reducer. Sending every query to
+the same node turns that node into a hotspot; instead, each query
+is sent to the healthy node with the lowest expected latency:
+
+    (in-flight queries + 1) * exponentially weighted latency
+
+A node whose recent requests failed is avoided for a back-off
+period that grows with the number of consecutive failures, as long
+as another node is available.
+
+The load of the nodes is shared by all contexts (threads) of a
+process that connect to the same cluster.
+"""
+
+_loads = {}
+_loads_lock = threading.Lock()
+
+"""Back-off (seconds) of a failed node per consecutive failure, and its limit"""
+_FAILURE_BACKOFF = 1.0
+_MAX_FAILURE_BACKOFF = 30.0
+
+
+class NodeLoad(object):
+    """
+    Exponentially weighted latency and in-flight count of the
+    nodes of an Apache Ignite cluster
+    """
+
+    def __init__(self,
+                 # (optional) weight of the most recent latency
+                 alpha=0.2):
+
+        self._alpha = alpha
+        """
+        (host, port) -> [ewma latency, in-flight, requests, errors,
+        consecutive failures, time of the last failure]
+        """
+        self._nodes = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, node):
+        entry = self._nodes.get(node)
+        if entry is None:
+            entry = [None, 0, 0, 0, 0, None]
+            self._nodes[node] = entry
+
+        return entry
+
+    def select(self, nodes):
+        """
+        Return the (host, port) with the lowest expected latency;
+        nodes without measured latency are preferred, so that all
+        nodes are sampled, and ties are broken randomly. Nodes that
+        are backing off after failures are only selected if no other
+        node is available
+        """
+        now = time.perf_counter()
+        with self._lock:
+            best, best_score = [], None
+            for node in nodes:
+                latency, in_flight, _, _, failures, failed_at = self._entry(node)
+                if failures and now - failed_at < min(failures * _FAILURE_BACKOFF, _MAX_FAILURE_BACKOFF):
+                    score = (2, failed_at)
+                elif latency is None:
+                    score = (0, in_flight)
+                else:
+                    score = (1, (in_flight + 1) * latency)
+
+                if best_score is None or score < best_score:
+                    best, best_score = [node], score
+                elif score == best_score:
+                    best.append(node)
+
+        return random.choice(best) if best else None
+
+    def begin(self, node):
+        """
+        Record the start of a query on a certain node and return
+        its start time
+        """
+        with self._lock:
+            entry = self._entry(node)
+            entry[1] += 1
+            entry[2] += 1
+
+        return time.perf_counter()
+
+    def end(self, node, start, failed=False, sample=True):
+        """
+        Record the end of a query; the latency of failed queries
+        does not contribute to the average, and their consecutive
+        count makes the node back off. A query that the node
+        answered with an error is recorded with `sample` False
+        """
+        end = time.perf_counter()
+        duration = end - start
+        with self._lock:
+            entry = self._entry(node)
+            entry[1] = max(0, entry[1] - 1)
+            if failed:
+                entry[3] += 1
+                entry[4] += 1
+                entry[5] = end
+                return
+
+            entry[4] = 0
+            if not sample:
+                return
+
+            if entry[0] is None:
+                entry[0] = duration
+            else:
+                entry[0] = self._alpha * duration + (1 - self._alpha) * entry[0]
+
+    def stats(self):
+        """
+        Return the statistics of all nodes that have been used
+        """
+        with self._lock:
+            return {
+                '{0}:{1}'.format(*node): {
+                    'latency_ms': None if latency is None else round(latency * 1000, 3),
+                    'in_flight': in_flight,
+                    'requests': requests,
+                    'errors': errors,
+                    'consecutive_failures': failures,
+                }
+                for node, (latency, in_flight, requests, errors, failures, _) in self._nodes.items()
+            }
+
+    def __repr__(self):
+        return '<NodeLoad nodes={0}>'.format(len(self._nodes))
+
+
+def node_load(nodes, alpha=0.2):
+    """
+    Return the (shared) node load of the cluster that is defined
+    by the provided nodes
+    """
+    key = tuple(sorted(tuple(node) for node in nodes))
+    with _loads_lock:
+        load = _loads.get(key)
+        if load is None:
+            load = NodeLoad(alpha)
+            _loads[key] = load
+
+    return load
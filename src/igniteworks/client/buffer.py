@@ -0,0 +1,293 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import mmap
+import pickle
+
+from collections import deque
+from itertools import islice
+
+from igniteworks.client.exceptions import NotSupportedError
+
+
+class RowBuffer(object):
+    """
+    Result row container with bounded memory usage: the first
+    rows (up to the spill threshold) are kept in memory; all
+    further rows are written in pages to a temporary file and
+    read back through a memory map.
+
+    The buffer is filled with `append` or `extend` and must be
+    sealed before it is read.
+    """
+
+    def __init__(self,
+                 # number of result rows that are kept in memory
+                 spill_threshold,
+                 # (optional) number of rows per spilled page
+                 page_size=1024):
+
+        self._threshold = spill_threshold
+        self._page_size = page_size
+
+        self._rows = []
+        self._page = []
+        """The (offset, length) of each spilled page"""
+        self._pages = []
+
+        self._file = None
+        self._mmap = None
+        self._length = 0
+
+        """The most recently decoded page"""
+        self._cached = (-1, None)
+
+    def append(self, row):
+
+        if self._length < self._threshold:
+            self._rows.append(row)
+        else:
+            self._page.append(row)
+            if len(self._page) >= self._page_size:
+                self._spill()
+
+        self._length += 1
+
+    def extend(self, rows):
+
+        for row in rows:
+            self.append(row)
+
+    def _spill(self):
+        """
+        Write the pending page to the temporary file
+        """
+        if self._file is None:
+            import tempfile
+            self._file = tempfile.TemporaryFile(prefix="igniteworks-")
+
+        data = pickle.dumps(self._page, protocol=pickle.HIGHEST_PROTOCOL)
+
+        offset = self._file.tell()
+        self._file.write(data)
+
+        self._pages.append((offset, len(data)))
+        self._page = []
+
+    def seal(self):
+        """
+        Finish writing and map the spilled pages into memory
+        """
+        if self._page:
+            self._spill()
+
+        if self._file is not None and self._mmap is None:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self
+
+    @property
+    def spilled(self):
+        return len(self._pages) > 0
+
+    def _read_page(self, number):
+
+        if self._cached[0] != number:
+            offset, length = self._pages[number]
+            self._cached = (number, pickle.loads(self._mmap[offset:offset + length]))
+
+        return self._cached[1]
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step == 1 and stop <= len(self._rows):
+                return self._rows[start:stop]
+            return [self[i] for i in range(start, stop, step)]
+
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("RowBuffer index out of range")
+
+        if index < len(self._rows):
+            return self._rows[index]
+
+        index -= len(self._rows)
+        return self._read_page(index // self._page_size)[index % self._page_size]
+
+    def __iter__(self):
+
+        yield from self._rows
+        for number in range(len(self._pages)):
+            offset, length = self._pages[number]
+            yield from pickle.loads(self._mmap[offset:offset + length])
+
+    def close(self):
+        """
+        Release the memory map and remove the temporary file
+        """
+        self._rows = []
+        self._cached = (-1, None)
+
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __repr__(self):
+        return '<RowBuffer rows={0} spilled_pages={1}>'.format(self._length, len(self._pages))
+
+
+class PagedRows(object):
+    """
+    Result row container over a (server-side) query cursor: the
+    rows are fetched page by page when they are accessed, and the
+    most recent pages are kept in a bounded cache. This supports
+    forward access without fetching the complete result, and
+    backward access within the cached pages without re-executing
+    the query.
+    """
+
+    def __init__(self,
+                 # iterator over the rows of a pyignite query cursor
+                 source,
+                 # number of rows per page
+                 page_size=1024,
+                 # (optional) maximum number of cached pages
+                 max_pages=16):
+
+        self._source = source
+        self._page_size = page_size
+
+        self._pages = deque(maxlen=max_pages)
+        """The index of the first cached row"""
+        self._start = 0
+        """The number of rows fetched so far"""
+        self._fetched = 0
+
+        self._exhausted = False
+
+    def _fetch_page(self):
+
+        page = list(map(tuple, islice(self._source, self._page_size)))
+        if len(page) < self._page_size:
+            """Release the server-side query cursor immediately"""
+            self._exhausted = True
+            if hasattr(self._source, "close"):
+                self._source.close()
+
+        if not page:
+            return False
+
+        if len(self._pages) == self._pages.maxlen:
+            self._start += len(self._pages[0])
+
+        self._pages.append(page)
+        self._fetched += len(page)
+
+        return True
+
+    def _fill(self, index):
+        """
+        Fetch pages until the row with the provided index is
+        available or the result is exhausted
+        """
+        while index >= self._fetched and not self._exhausted:
+            self._fetch_page()
+
+    def _row(self, index):
+
+        if index < 0:
+            raise IndexError("Negative row index on a streamed result")
+
+        self._fill(index)
+        if index >= self._fetched:
+            raise IndexError("Row index out of range")
+
+        if index < self._start:
+            raise NotSupportedError(
+                "Row " + str(index) + " is no longer cached; re-execute the query.")
+
+        index -= self._start
+        for page in self._pages:
+            if index < len(page):
+                return page[index]
+            index -= len(page)
+
+    def _slice(self, start, stop):
+
+        rows = []
+
+        index = start
+        while stop is None or index < stop:
+            self._fill(index)
+            if index >= self._fetched:
+                break
+
+            if index < self._start:
+                raise NotSupportedError(
+                    "Row " + str(index) + " is no longer cached; re-execute the query.")
+            """Copy the remaining rows of the page that contains the index"""
+            offset = self._start
+            for page in self._pages:
+                if index < offset + len(page):
+                    end = len(page) if stop is None else min(len(page), stop - offset)
+                    rows.extend(page[index - offset:end])
+                    index = offset + end
+                    break
+                offset += len(page)
+
+        return rows
+
+    @property
+    def exhausted(self):
+        return self._exhausted
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            if index.step not in (None, 1) or (index.start or 0) < 0 or \
+                    (index.stop is not None and index.stop < 0):
+                raise NotSupportedError("Unsupported slice on a streamed result")
+            return self._slice(index.start or 0, index.stop)
+
+        return self._row(index)
+
+    def close(self):
+        """
+        Release the cached pages and close the query cursor, if
+        it is not exhausted yet
+        """
+        self._pages.clear()
+        if not self._exhausted:
+            self._exhausted = True
+            if hasattr(self._source, "close"):
+                self._source.close()
+
+    def __repr__(self):
+        return '<PagedRows fetched={0} cached_pages={1}>'.format(self._fetched, len(self._pages))
@@ -0,0 +1,316 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import base64
+import datetime
+import decimal
+import json
+import queue
+import threading
+import uuid
+
+from igniteworks.client.exceptions import ProgrammingError
+
+"""
+Keyset pagination over a complete table: the table is read in
+chunks that are ordered by its key columns, and each chunk starts
+after the last key of the previous chunk:
+
+SELECT * FROM <table>
+    WHERE k1 > :k1 OR (k1 = :k1 AND k2 > :k2) ...
+    ORDER BY k1, k2, ... LIMIT <chunk size>
+
+Each chunk is an independent (retryable) query, so the memory
+usage is bounded by the chunk size, and an interrupted export is
+resumed from the checkpoint token of the last processed chunk.
+"""
+
+_CHECKPOINT_VERSION = 1
+
+
+def _encode_value(value):
+
+    if isinstance(value, datetime.datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'$time': value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {'$decimal': str(value)}
+    if isinstance(value, uuid.UUID):
+        return {'$uuid': str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {'$bytes': base64.b64encode(value).decode("ascii")}
+
+    return value
+
+
+def _decode_value(value):
+
+    if not isinstance(value, dict) or len(value) != 1:
+        return value
+
+    (tag, data), = value.items()
+    if tag == '$datetime':
+        return datetime.datetime.fromisoformat(data)
+    if tag == '$date':
+        return datetime.date.fromisoformat(data)
+    if tag == '$time':
+        return datetime.time.fromisoformat(data)
+    if tag == '$decimal':
+        return decimal.Decimal(data)
+    if tag == '$uuid':
+        return uuid.UUID(data)
+    if tag == '$bytes':
+        return base64.b64decode(data)
+
+    return value
+
+
+def encode_checkpoint(table_name, schema, key_columns, key_values):
+    """
+    Build the (URL-safe) checkpoint token after a certain key
+    """
+    data = {
+        'version': _CHECKPOINT_VERSION,
+        'table': table_name,
+        'schema': schema,
+        'keys': list(key_columns),
+        'values': [_encode_value(value) for value in key_values],
+    }
+    return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii")
+
+
+def decode_checkpoint(token):
+    """
+    Decode a checkpoint token into (table, schema, key columns,
+    key values)
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError) as e:
+        raise ProgrammingError("Invalid checkpoint token: " + str(e))
+
+    if data.get("version") != _CHECKPOINT_VERSION:
+        raise ProgrammingError("Unsupported checkpoint token version.")
+
+    return data["table"], data["schema"], data["keys"], [_decode_value(value) for value in data["values"]]
+
+
+def keyset_statement(table_name, schema, columns, key_columns, after, chunk_size):
+    """
+    Build the statement (with positional parameters) of the chunk
+    that starts after the provided key values
+    """
+    table = schema + "." + table_name if schema else table_name
+
+    stmt = "SELECT " + (", ".join(columns) if columns else "*") + " FROM " + table
+    parameters = []
+
+    if after is not None:
+        """k1 > ? OR (k1 = ? AND k2 > ?) OR ..."""
+        conditions = []
+        for position, key_column in enumerate(key_columns):
+            terms = []
+            for previous in range(position):
+                terms.append(key_columns[previous] + " = %s")
+                parameters.append(after[previous])
+            terms.append(key_column + " > %s")
+            parameters.append(after[position])
+
+            conditions.append(terms[0] if len(terms) == 1 else "(" + " AND ".join(terms) + ")")
+
+        stmt += " WHERE " + " OR ".join(conditions)
+
+    stmt += " ORDER BY " + ", ".join(key_columns) + " LIMIT " + str(int(chunk_size))
+    return stmt, parameters
+
+
+class ChunkIterator(object):
+    """
+    Iterator over the chunks (lists of row tuples) of a table;
+    `checkpoint` is the token to resume after the last chunk that
+    has been returned
+    """
+
+    def __init__(self,
+                 # callable(statement, parameters) that returns a response
+                 execute,
+                 table_name,
+                 key_columns,
+                 schema=None,
+                 # (optional) columns to read; key columns are added
+                 columns=None,
+                 # (optional) number of rows per chunk
+                 chunk_size=10000,
+                 # (optional) key values to start after (from a checkpoint)
+                 after=None,
+                 # (optional) fetch the next chunk in a background thread
+                 prefetch=False):
+
+        self._execute = execute
+
+        self.table_name = table_name
+        self.schema = schema
+        self.key_columns = list(key_columns)
+
+        if columns:
+            columns = list(columns)
+            names = [column.upper() for column in columns]
+            columns += [key for key in self.key_columns if key.upper() not in names]
+        self._columns = columns
+
+        self._chunk_size = chunk_size
+        self._after = after
+
+        self.cols = None
+        self.checkpoint = encode_checkpoint(table_name, schema, self.key_columns, after) \
+            if after is not None else None
+
+        self._done = False
+        """
+        The iteration has ended (exhausted, failed or closed); the
+        error of a failed prefetch is raised again
+        """
+        self._finished = False
+        self._error = None
+
+        self._queue = None
+        self._closed = threading.Event()
+        self._thread = None
+        if prefetch:
+            self._queue = queue.Queue(maxsize=1)
+            self._thread = threading.Thread(target=self._prefetch,
+                                            name="igniteworks-chunks",
+                                            daemon=True)
+            self._thread.start()
+
+    def _fetch(self):
+        """
+        Fetch the next chunk; returns (rows, key values of the last
+        row) or None if the table is exhausted
+        """
+        if self._done:
+            return None
+
+        stmt, parameters = keyset_statement(self.table_name, self.schema, self._columns,
+                                            self.key_columns, self._after, self._chunk_size)
+
+        response = self._execute(stmt, parameters)
+        rows = list(response.get("rows", []))
+        if hasattr(response.get("rows"), "close"):
+            response["rows"].close()
+
+        if self.cols is None:
+            self.cols = response.get("cols", [])
+
+        if len(rows) < self._chunk_size:
+            self._done = True
+        if not rows:
+            return None
+
+        names = [str(col).upper() for col in self.cols]
+        try:
+            positions = [names.index(key.upper()) for key in self.key_columns]
+        except ValueError:
+            raise ProgrammingError("Key columns are not part of the result.")
+
+        self._after = [rows[-1][position] for position in positions]
+        return rows, self._after
+
+    def _prefetch(self):
+
+        try:
+            while not self._closed.is_set():
+                chunk = self._fetch()
+                self._put(chunk)
+                if chunk is None:
+                    return
+
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __iter__(self):
+        return self
+
+    def _get(self):
+        """
+        Take the next prefetched item; None if the iterator has
+        been closed
+        """
+        while True:
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return None
+
+    def __next__(self):
+
+        if self._finished or self._closed.is_set():
+            self._finished = True
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+
+        if self._queue is not None:
+            chunk = self._get()
+            if isinstance(chunk, Exception):
+                self._finished = True
+                self._error = chunk
+                raise chunk
+        else:
+            chunk = self._fetch()
+
+        if chunk is None:
+            self._finished = True
+            raise StopIteration
+
+        rows, after = chunk
+        self.checkpoint = encode_checkpoint(self.table_name, self.schema, self.key_columns, after)
+
+        return rows
+
+    def close(self):
+        """
+        Stop prefetching and end the iteration; the checkpoint
+        refers to the last chunk that has been returned
+        """
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excs):
+        self.close()
+
+    def __repr__(self):
+        return '<ChunkIterator {0}>'.format(self.table_name)
@@ -17,9 +17,22 @@
 # @author Stefan Krusche, Dr. Krusche & Partner PartG
 #
 
+import functools
+import logging
+import threading
+import weakref
+
+from contextlib import contextmanager
+
 from .exceptions import ProgrammingError
+from .chunks import ChunkIterator, decode_checkpoint
 from .cursor import Cursor
+from .federation import FederatedContext
 from .ignite import IgniteContext
+from .profiling import profile_target, trace_memory
+from .writebehind import WriteBehind
+
+logger = logging.getLogger(__name__)
 
 
 class Connection(object):
@@ -64,36 +77,311 @@ class Connection(object):
                  username=None,
                  # password to authenticate to Ignite cluster.
                  password=None,
+                 # (optional) maximum number of statements of an `execute_batch`
+                 # call that are sent concurrently. Each worker uses its own
+                 # Ignite client. Default is 8.
+                 max_batch_workers=8,
+                 # (optional) number of result rows kept in memory per result;
+                 # further rows are spilled to a temporary file and read back
+                 # through memory-mapped I/O. Default is None (no spilling).
+                 spill_threshold=None,
+                 # (optional) cursor page size. Default is 1024, which means that
+                 # client makes one server call per 1024 rows.
+                 page_size=1024,
+                 # (optional) number of result pages cached for `Cursor.scroll`; if
+                 # set, results are streamed and fetched page by page when they are
+                 # accessed. Default is None (results are fetched completely).
+                 page_cache=None,
+                 # (optional) path of a local schema snapshot file that persists
+                 # the table, column, key and index metadata across restarts.
+                 # Default is None (metadata is always retrieved from the cluster).
+                 schema_snapshot=None,
+                 # (optional) number of rows per `put_all` request when
+                 # `Cursor.executemany` merges into a key-mapped table, and per
+                 # multi-row statement when it inserts. Default is 1000.
+                 batch_size=1000,
+                 # (optional) number of nodes that are written concurrently by
+                 # `Cursor.executemany`. Default is 4.
+                 batch_concurrency=4,
+                 # (optional) number of retries of read-only statements after a
+                 # connection failure. Default is 2.
+                 retries=2,
+                 # (optional) base delay (in seconds) of the jittered backoff
+                 # between two retries. Default is 0.1 seconds.
+                 retry_backoff=0.1,
+                 # (optional) number of consecutive connection failures after which
+                 # requests to the cluster are rejected immediately. Default is 5.
+                 breaker_threshold=5,
+                 # (optional) seconds before a rejected cluster is tried again.
+                 # Default is 30.0 seconds. The circuit breaker is shared by all
+                 # connections of a process to the same servers, and the threshold
+                 # and timeout of the first of these connections apply.
+                 breaker_timeout=30.0,
+                 # (optional) list (or comma-separated string) of REPLICATED tables
+                 # that are kept in local memory to answer simple lookups.
+                 # Default is None.
+                 near_cache=None,
+                 # (optional) seconds between two version checks of a near-cached
+                 # table. Default is 60.0 seconds.
+                 near_cache_ttl=60.0,
+                 # (optional) latency (in seconds) above which statements, their
+                 # parameters, timing and query plan are logged to the
+                 # `igniteworks.slowlog` logger. Default is None (no logging).
+                 slow_query_threshold=None,
+                 # (optional) capture the query plan of slow SELECT statements.
+                 # Default is True.
+                 slow_query_plan=True,
+                 # (optional) maximum number of cursors with an open server-side
+                 # query cursor (streamed results, see `page_cache`). Default is 64.
+                 max_open_cursors=64,
+                 # (optional) seconds the row count and size estimates of a table
+                 # are cached. Default is 10.0 seconds.
+                 stats_ttl=10.0,
+                 # (optional) minimum number of keys of a DELETE or UPDATE with an IN
+                 # list on the key column that is sent as partition-grouped key
+                 # removals or chunked updates. Default is 1000 (0 disables). The
+                 # row count of such a DELETE is the number of distinct keys that
+                 # were removed, including keys that did not exist.
+                 keyset_threshold=1000,
+                 # (optional) number of keys per request of key-set DML. Default
+                 # is 1000.
+                 keyset_chunk_size=1000,
+                 # (optional) buffer INSERT and MERGE statements and write them in
+                 # batches from a background thread. Default is False.
+                 write_behind=False,
+                 # (optional) number of buffered rows that triggers a write-behind
+                 # flush. Default is 1000.
+                 write_behind_batch=1000,
+                 # (optional) maximum seconds rows are buffered. Default is 1.0.
+                 write_behind_interval=1.0,
+                 # (optional) maximum number of buffered rows per statement; a full
+                 # buffer blocks further inserts. Default is 10000.
+                 write_behind_capacity=10000,
+                 # (optional) callable(error, statement, parameter sets) that is
+                 # called if buffered rows cannot be written. Default is None
+                 # (errors are logged).
+                 write_behind_on_error=None,
+                 # (optional) list of Ignite clusters to federate; each cluster is
+                 # defined by its servers (e.g. host1:10800,host2:10800) or by a
+                 # dictionary with 'servers', an optional 'name' and overrides of
+                 # the connection options (e.g. 'username', 'password'). A string
+                 # separates the clusters with ';'. Queries are run on all clusters
+                 # concurrently and their results are merged. Default is None.
+                 clusters=None,
+                 # (optional) profile the stages of each statement; a file path
+                 # (JSON lines, or collapsed stacks if it ends with `.folded`) or
+                 # True (`igniteworks.profile` logger). Default is None (the
+                 # IGNITEWORKS_PROFILE environment variable).
+                 profile=None,
+                 # (optional) trace the memory allocations of each profiled stage.
+                 # Default is None (the IGNITEWORKS_PROFILE_MEMORY environment
+                 # variable).
+                 profile_memory=None,
                  ):
 
+        if isinstance(clusters, str):
+            clusters = [cluster.strip() for cluster in clusters.split(";") if cluster.strip()]
+
+        if clusters and not servers:
+            first = clusters[0]
+            servers = first.get("servers") if isinstance(first, dict) else first
+
         if servers:
 
-            tokens = servers.split(":", 1)
-
-            host = tokens[0]
-            port = int(tokens[1])
-
-            self.context = IgniteContext(
-                host=host,
-                port=port,
-                timeout=timeout,
-                handshake_timeout=handshake_timeout,
-                use_ssl=use_ssl,
-                ssl_ciphers=ssl_ciphers,
-                ssl_cert_reqs=ssl_cert_reqs,
-                ssl_keyfile=ssl_keyfile,
-                ssl_keyfile_password=ssl_keyfile_password,
-                ssl_certfile=ssl_certfile,
-                ssl_ca_certfile=ssl_ca_certfile,
-                username=username,
-                password=password,
-            )
+            """
+            One or more Ignite nodes, e.g. host1:10800,host2:10800
+            """
+            nodes = _parse_servers(servers)
+            host, port = nodes[0]
+
+            """
+            The connection arguments are retained to open an Ignite
+            client for each thread that uses this connection
+            """
+            self._context_args = {
+                'host': host,
+                'port': port,
+                'timeout': timeout,
+                'handshake_timeout': handshake_timeout,
+                'use_ssl': use_ssl,
+                'ssl_version': ssl_version,
+                'ssl_ciphers': ssl_ciphers,
+                'ssl_cert_reqs': ssl_cert_reqs,
+                'ssl_keyfile': ssl_keyfile,
+                'ssl_keyfile_password': ssl_keyfile_password,
+                'ssl_certfile': ssl_certfile,
+                'ssl_ca_certfile': ssl_ca_certfile,
+                'username': username,
+                'password': password,
+                'spill_threshold': int(spill_threshold) if spill_threshold else None,
+                'page_size': int(page_size),
+                'page_cache': int(page_cache) if page_cache else None,
+                'schema_snapshot': schema_snapshot,
+                'nodes': nodes,
+                'batch_size': int(batch_size),
+                'batch_concurrency': int(batch_concurrency),
+                'retries': int(retries),
+                'retry_backoff': float(retry_backoff),
+                'breaker_threshold': int(breaker_threshold),
+                'breaker_timeout': float(breaker_timeout),
+                'near_cache': [table.strip() for table in near_cache.split(",")]
+                    if isinstance(near_cache, str) else near_cache,
+                'near_cache_ttl': float(near_cache_ttl),
+                'slow_query_threshold': float(slow_query_threshold)
+                    if slow_query_threshold is not None else None,
+                'slow_query_plan': _as_bool(slow_query_plan),
+                'stats_ttl': float(stats_ttl),
+                'keyset_threshold': int(keyset_threshold) if keyset_threshold else None,
+                'keyset_chunk_size': int(keyset_chunk_size),
+            }
+
+            """
+            The connection arguments of each federated cluster
+            """
+            self._cluster_args = []
+            for cluster in clusters or []:
+                if not isinstance(cluster, dict):
+                    cluster = {'servers': cluster}
+
+                cluster = dict(cluster)
+                cluster_nodes = _parse_servers(cluster.pop("servers"))
+                name = cluster.pop("name", None) or "{0}:{1}".format(*cluster_nodes[0])
+
+                args = dict(self._context_args)
+                args.update(cluster)
+                args.update({
+                    'host': cluster_nodes[0][0],
+                    'port': cluster_nodes[0][1],
+                    'nodes': cluster_nodes,
+                })
+                self._cluster_args.append((name, args))
+
+            if self._cluster_args and _as_bool(write_behind):
+                raise ProgrammingError("Federated connections do not support write-behind.")
+
+            """
+            The Ignite Thin client is not thread-safe; each request
+            (or streamed result) checks out an idle context of this
+            connection for exclusive use and returns it afterwards.
+            The number of contexts (and sockets) is therefore limited
+            by the number of concurrent requests, not by the number
+            of threads that ever used the connection
+            """
+            self._local = threading.local()
+            self._contexts = set()
+            self._idle = []
+            self._lock = threading.Lock()
+
+            self._max_batch_workers = max_batch_workers
+            self._batch_executor = None
+
+            """
+            The streamed results with an open server-side query
+            cursor, and the number of such results that have been
+            closed after their Cursor was dropped without `close`
+            """
+            self._max_open_cursors = int(max_open_cursors) if max_open_cursors else None
+            self._server_cursors = set()
+            self._reaped_cursors = 0
+
+            """The first context is opened eagerly"""
+            self._idle.append(self._open_context())
+
+            """
+            Buffered inserts are written by a dedicated Ignite context
+            of the write-behind thread
+            """
+            self._write_behind = None
+            if _as_bool(write_behind):
+                self._write_behind = WriteBehind(functools.partial(IgniteContext, **self._context_args),
+                                                 batch_size=int(write_behind_batch),
+                                                 interval=float(write_behind_interval),
+                                                 capacity=int(write_behind_capacity),
+                                                 on_error=write_behind_on_error)
+
+            """The default profile target of the cursors"""
+            self._profile = profile_target(profile)
+            self._profile_memory = trace_memory(profile_memory)
 
             self._closed = False
 
         else:
             raise ProgrammingError("No connection url provided.")
 
+    def _open_context(self):
+
+        if self._cluster_args:
+            contexts = []
+            try:
+                for name, args in self._cluster_args:
+                    contexts.append((name, IgniteContext(**args)))
+            except Exception:
+                for _, member in contexts:
+                    member.close()
+                raise
+
+            context = FederatedContext(contexts, page_size=self._context_args['page_size'])
+        else:
+            context = IgniteContext(**self._context_args)
+        with self._lock:
+            self._contexts.add(context)
+
+        return context
+
+    def _acquire(self):
+        """
+        Check out an idle Ignite context, or open a new one if all
+        contexts are in use
+        """
+        if self._closed:
+            raise ProgrammingError("Connection closed")
+
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+
+        return self._open_context()
+
+    def _release_context(self, context):
+        """
+        Return a checked out Ignite context; the contexts of a
+        closed connection have been closed already
+        """
+        with self._lock:
+            if not self._closed and context in self._contexts and context not in self._idle:
+                self._idle.append(context)
+
+    @contextmanager
+    def checkout(self):
+        """
+        Check out an Ignite context for exclusive use by the current
+        thread within the `with` block; streamed results must be
+        consumed within the block
+        """
+        context = self._acquire()
+        try:
+            yield context
+        finally:
+            self._release_context(context)
+
+    @property
+    def context(self):
+        """
+        The Ignite context that is reserved for the current thread
+        (backwards compatibility); it is returned to the idle
+        contexts when the thread has terminated
+        """
+        if self._closed:
+            raise ProgrammingError("Connection closed")
+
+        context = getattr(self._local, "context", None)
+        if context is None:
+            context = self._acquire()
+            self._local.context = context
+            weakref.finalize(threading.current_thread(), self._release_context, context)
+
+        return context
+
     def cursor(self):
         """
         Return a new Cursor Object using the connection.
@@ -103,12 +391,206 @@ class Connection(object):
         else:
             raise ProgrammingError("Connection closed")
 
+    def execute_batch(self, operations):
+        """
+        Execute a sequence of independent SQL statements concurrently
+        and return one Cursor per statement, in the order provided.
+
+        Each operation is either an SQL statement or a tuple of SQL
+        statement and parameters. The statements are sent by a pool of
+        worker threads, each with its own Ignite client, so that the
+        overall latency is determined by the slowest statement and not
+        by the sum of all round trips.
+        """
+        if self._closed:
+            raise ProgrammingError("Connection closed")
+
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+        statements = []
+        for operation in operations:
+            if isinstance(operation, (tuple, list)):
+                sql, parameters = operation
+            else:
+                sql, parameters = operation, None
+
+            if not sql:
+                raise ProgrammingError("No SQL statement provided.")
+
+            statements.append((sql, parameters))
+
+        if len(statements) == 0:
+            return []
+
+        with self._lock:
+            if self._batch_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._batch_executor = ThreadPoolExecutor(
+                    max_workers=self._max_batch_workers,
+                    thread_name_prefix="igniteworks-batch")
+
+        futures = [self._batch_executor.submit(self._execute_pooled, sql, parameters)
+                   for sql, parameters in statements]
+
+        cursors = []
+        for future in futures:
+            cursor = Cursor(self)
+            cursor._set_result(future.result())
+            cursors.append(cursor)
+
+        return cursors
+
+    def _execute_pooled(self, sql, parameters):
+        """
+        Execute a single statement with a checked out Ignite context
+        from a worker thread; a streamed result is read completely,
+        as its query cursor must not be used by other threads
+        """
+        with self.checkout() as context:
+            result = context.sql(sql, parameters)
+            rows = result.get("rows")
+            if getattr(rows, "exhausted", True) is False:
+                result["rows"] = rows[0:]
+
+        return result
+
+    def iter_chunks(self, table_name, key_columns=None, chunk_size=10000, schema=None,
+                    columns=None, checkpoint=None, prefetch=False):
+        """
+        Iterate over all rows of a table in chunks (lists of row
+        tuples) that are ordered by the key columns, using keyset
+        pagination. The key columns default to the (reflected)
+        primary key of the table.
+
+        The `checkpoint` of the iterator is a token that resumes
+        the iteration after the last returned chunk; with `prefetch`
+        the next chunk is fetched by a background thread (with its
+        own Ignite client) while the current chunk is processed.
+        """
+        if self._closed:
+            raise ProgrammingError("Connection closed")
+
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+        after = None
+        if checkpoint is not None:
+            table, checkpoint_schema, checkpoint_keys, after = decode_checkpoint(checkpoint)
+            if table != table_name or (checkpoint_schema or None) != (schema or None):
+                raise ProgrammingError("Checkpoint refers to a different table.")
+            if key_columns and [key.upper() for key in key_columns] != \
+                    [key.upper() for key in checkpoint_keys]:
+                raise ProgrammingError("Checkpoint refers to different key columns.")
+            key_columns = checkpoint_keys
+
+        if not key_columns:
+            sql = "GET KEYS FROM " + table_name
+            if schema:
+                sql += " WITH " + schema
+
+            with self.checkout() as context:
+                key_columns = [row[0] for row in context.sql(sql)["rows"]]
+            if len(key_columns) == 0:
+                raise ProgrammingError("Table " + table_name + " has no key columns.")
+
+        return ChunkIterator(self._execute_pooled, table_name, key_columns,
+                             schema=schema,
+                             columns=columns,
+                             chunk_size=chunk_size,
+                             after=after,
+                             prefetch=prefetch)
+
+    def _check_open_cursors(self):
+        """
+        Reject a new query if the maximum number of open server-side
+        query cursors is reached
+        """
+        if self._max_open_cursors and self.open_cursors >= self._max_open_cursors:
+            raise ProgrammingError(
+                "Too many open cursors (" + str(self._max_open_cursors) + "); "
+                "fetch all rows of or close the cursors that are no longer used.")
+
+    def _register_server_cursor(self, rows):
+
+        with self._lock:
+            self._server_cursors.add(rows)
+
+    def _reap_server_cursor(self, rows, context):
+        """
+        Close the server-side query cursor of a Cursor that has
+        been dropped without `close`, and return its Ignite context;
+        the context is reserved for the Cursor, so this is safe in
+        any thread
+        """
+        if not rows.exhausted:
+            try:
+                rows.close()
+            except Exception as e:
+                logger.debug("Server-side cursor cannot be closed: %s", e)
+
+            with self._lock:
+                self._server_cursors.discard(rows)
+                self._reaped_cursors += 1
+
+        self._release_context(context)
+
+    def node_stats(self):
+        """
+        The latency (EWMA), in-flight count, request and error count
+        of the nodes that executed SQL queries
+        """
+        with self.checkout() as context:
+            return context.node_stats()
+
+    @property
+    def open_cursors(self):
+        """
+        The number of open server-side query cursors
+        """
+        with self._lock:
+            self._server_cursors = {rows for rows in self._server_cursors if not rows.exhausted}
+            return len(self._server_cursors)
+
+    @property
+    def reaped_cursors(self):
+        """
+        The number of server-side query cursors that have been
+        closed after their Cursor was dropped without `close`
+        """
+        return self._reaped_cursors
+
     def close(self):
         """
         Close the connection now
         """
         self._closed = True
-        self.context.close()
+
+        if self._write_behind is not None:
+            self._write_behind.close()
+            self._write_behind = None
+
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=True)
+            self._batch_executor = None
+
+        with self._lock:
+            server_cursors = list(self._server_cursors)
+            self._server_cursors.clear()
+
+        for rows in server_cursors:
+            try:
+                rows.close()
+            except Exception as e:
+                logger.debug("Server-side cursor cannot be closed: %s", e)
+
+        with self._lock:
+            contexts = list(self._contexts)
+            self._contexts.clear()
+            self._idle = []
+
+        for context in contexts:
+            context.close()
 
     def commit(self):
         """
@@ -121,7 +603,7 @@ class Connection(object):
         return self._closed
 
     def __repr__(self):
-        return '<Connection {0}>'.format(repr(self.context))
+        return '<Connection {0}>'.format(",".join("{0}:{1}".format(*node) for node in self._context_args['nodes']))
 
     def __enter__(self):
         return self
@@ -130,5 +612,29 @@ class Connection(object):
         self.close()
 
 
+def _parse_servers(servers):
+    """
+    Transform a comma-separated list of servers (host:port)
+    into a list of (host, port) pairs
+    """
+    nodes = []
+    for server in servers.split(","):
+        tokens = server.strip().split(":", 1)
+        nodes.append((tokens[0], int(tokens[1]) if len(tokens) > 1 else 10800))
+
+    return nodes
+
+
+def _as_bool(value):
+    """
+    Interpret a connection option that may be provided as string
+    (e.g. as query parameter of an SQLAlchemy URL)
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+    return bool(value)
+
+
 # For backwards compatibility and not to break existing imports
 connect = Connection
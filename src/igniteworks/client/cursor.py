@@ -18,8 +18,12 @@
 #
 
 import warnings
+import weakref
+
+from contextlib import nullcontext
 
 from .exceptions import ProgrammingError
+from .profiling import Profile, profile_target
 
 
 class Cursor(object):
@@ -34,6 +38,17 @@ class Cursor(object):
         #
         self._result = None
         self.rows = None
+        self._rownumber = 0
+        """Closes a streamed result if the cursor is dropped without `close`"""
+        self._finalizer = None
+        """The Ignite context that is reserved for a streamed result"""
+        self._context = None
+        """
+        The profile target of the statements of this cursor (a file
+        path, True or False); None refers to the connection default
+        """
+        self.profile = None
+        self._profile = None
 
     def execute(self, sql, parameters=None, bulk_parameters=None):
         """
@@ -50,15 +65,92 @@ class Cursor(object):
         requests
         """
         if sql:
-            """SQL request to retrieve data from Apache Ignite"""
-            self._result = self.connection.context.sql(sql, parameters,
-                                                       bulk_parameters)
-            if "rows" in self._result:
-                self.rows = iter(self._result["rows"])
+            """INSERT and MERGE statements may be buffered"""
+            write_behind = self.connection._write_behind
+            if write_behind is not None:
+                result = write_behind.execute(sql, parameters, bulk_parameters)
+                if result is not None:
+                    self._set_result(result)
+                    return
+
+            self.connection._check_open_cursors()
+
+            """The previous result returns its context first"""
+            self._release()
+            context = self.connection._acquire()
+
+            profile = self._new_profile(sql)
+            try:
+                if profile is None:
+                    """SQL request to retrieve data from Apache Ignite"""
+                    result = context.sql(sql, parameters, bulk_parameters)
+                else:
+                    with profile.active():
+                        result = context.sql(sql, parameters, bulk_parameters)
+            except Exception:
+                self.connection._release_context(context)
+                if profile is not None:
+                    profile.finish()
+                raise
+
+            self._set_result(result, context)
+            self._profile = profile
 
         else:
             raise ProgrammingError("No SQL statement provided. Cursor closed")
 
+    def _new_profile(self, sql):
+        """
+        Start the profile of a statement, or return None if the
+        statement is not profiled
+        """
+        target = self.connection._profile if self.profile is None else profile_target(self.profile)
+        if target is None:
+            return None
+        """The previous statement is complete"""
+        self._finish_profile()
+
+        return Profile(sql, target, memory=self.connection._profile_memory)
+
+    def _finish_profile(self):
+
+        if self._profile is not None:
+            self._profile.finish()
+            self._profile = None
+
+    def _fetch_stage(self):
+
+        if self._profile is None:
+            return nullcontext()
+
+        return self._profile.stage("fetch")
+
+    def _set_result(self, result, context=None):
+        """
+        Assign the response of an Ignite request to this cursor;
+        the Ignite context that executed the request is returned,
+        unless the result is streamed from it
+        """
+        self._release()
+
+        self._result = result
+        if "rows" in self._result:
+            self.rows = self._result["rows"]
+            self._rownumber = 0
+            """
+            A streamed result keeps a server-side query cursor (and
+            its Ignite context) open until it is exhausted or closed
+            """
+            if context is not None and getattr(self.rows, "exhausted", True) is False:
+                self.connection._register_server_cursor(self.rows)
+                self._finalizer = weakref.finalize(self, self.connection._reap_server_cursor,
+                                                   self.rows, context)
+                self._context = context
+                return
+
+        if context is not None:
+            self.connection._release_context(context)
+
     def executemany(self, sql, seq_of_parameters):
         """
         Prepare a database operation (query or command) and then execute it
@@ -82,7 +174,8 @@ class Cursor(object):
             "cols": self._result.get("cols", []),
             "results": self._result.get("results")
         }
-        self.rows = iter(self._result["rows"])
+        self.rows = self._result["rows"]
+        self._rownumber = 0
         return self._result["results"]
 
     def fetchone(self):
@@ -117,12 +210,11 @@ class Cursor(object):
             count = self.array_size
         if count == 0:
             return self.fetchall()
-        result = []
-        for i in range(count):
-            try:
-                result.append(self.next())
-            except StopIteration:
-                pass
+
+        with self._fetch_stage():
+            result = self._remaining()[self._rownumber:self._rownumber + count]
+        self._rownumber += len(result)
+        self._return_context()
         return result
 
     def fetchall(self):
@@ -131,22 +223,83 @@ class Cursor(object):
         sequence of sequences (e.g. a list of tuples). Note that the cursor's
         array_size attribute can affect the performance of this operation.
         """
-        result = []
-        iterate = True
-        while iterate:
-            try:
-                result.append(self.next())
-            except StopIteration:
-                iterate = False
+        with self._fetch_stage():
+            result = self._remaining()[self._rownumber:]
+        self._rownumber += len(result)
+        self._return_context()
         return result
 
+    def scroll(self, value, mode='relative'):
+        """
+        Scroll the cursor in the result set to a new position
+        according to mode. If mode is ``relative`` (default), value
+        is taken as offset to the current position in the result
+        set; if set to ``absolute``, value states an absolute
+        target position.
+        """
+        rows = self._remaining()
+
+        if mode == 'relative':
+            position = self._rownumber + value
+        elif mode == 'absolute':
+            position = value
+        else:
+            raise ProgrammingError("Scroll mode " + str(mode) + " is not supported.")
+
+        if position < 0:
+            raise IndexError("Scroll position out of range")
+        """
+        The row at the new position must exist, or the position must
+        be directly after the last row; this fetches the required
+        pages of a streamed result
+        """
+        try:
+            rows[position]
+        except IndexError:
+            if position > 0:
+                rows[position - 1]
+
+        self._rownumber = position
+
+    @property
+    def rownumber(self):
+        """
+        This read-only attribute provides the current 0-based index
+        of the cursor in the result set, or None if the index cannot
+        be determined.
+        """
+        if self._closed or self.rows is None:
+            return None
+        return self._rownumber
+
     def close(self):
         """
         Close the cursor now
         """
         self._closed = True
+        self._release()
         self._result = None
 
+    def _release(self):
+        """
+        Release the resources held by the current result, e.g. the
+        temporary file of spilled rows
+        """
+        self._finish_profile()
+
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+
+        if self._result:
+            rows = self._result.get("rows")
+            if hasattr(rows, "close"):
+                rows.close()
+
+        if self._context is not None:
+            context, self._context = self._context, None
+            self.connection._release_context(context)
+
     def setinputsizes(self, sizes):
         """
         Not supported method.
@@ -175,13 +328,42 @@ class Cursor(object):
         Return the next row of a query result set, respecting if cursor was
         closed.
         """
+        rows = self._remaining()
+        try:
+            with self._fetch_stage():
+                row = rows[self._rownumber]
+        except IndexError:
+            self._return_context()
+            raise StopIteration
+
+        self._rownumber += 1
+        self._return_context()
+        return row
+
+    def _return_context(self):
+        """
+        Return the Ignite context of a streamed result as soon as
+        its query cursor is exhausted
+        """
+        if self._context is not None and self.rows.exhausted:
+            self._finalizer.detach()
+            self._finalizer = None
+
+            context, self._context = self._context, None
+            self.connection._release_context(context)
+
+    def _remaining(self):
+        """
+        Return the rows of the current result, respecting if cursor
+        was closed.
+        """
         if self.rows is None:
             raise ProgrammingError(
                 "No result available. " +
                 "execute() or executemany() must be called first."
             )
         elif not self._closed:
-            return next(self.rows)
+            return self.rows
         else:
             raise ProgrammingError("Cursor closed")
 
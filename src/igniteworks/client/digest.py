@@ -0,0 +1,42 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import hashlib
+
+"""
+Content digests of query results, e.g. to detect whether a table
+has changed since it was loaded. The built-in hash is unsuitable:
+it is lossy (hash(-1) == hash(-2)) and, with 64 bits, collides
+for large results far more often than a cryptographic digest.
+"""
+
+
+def row_digest(rows):
+    """
+    A collision-resistant (SHA-1) digest of a sequence of rows;
+    the rows are hashed one by one, without building the
+    representation of the complete result
+    """
+    digest = hashlib.sha1()
+    for row in rows:
+        """The representation of a value escapes line breaks"""
+        digest.update(repr(tuple(row)).encode("utf-8"))
+        digest.update(b"\n")
+
+    return digest.digest()
@@ -65,11 +65,22 @@ class NotSupportedError(IgniteError):
     pass
 
 
+# DB-API names of the base classes
+
+DatabaseError = IgniteError
+
+Warning = IgniteWarning
+
+
 # exceptions not in db api
 
 class IgniteConnectionError(OperationalError):
     pass
 
 
+class CircuitOpenError(IgniteConnectionError):
+    pass
+
+
 class TimezoneUnawareException(Error):
     pass
@@ -0,0 +1,168 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import re
+
+"""
+The EXPLAIN statement of Apache Ignite returns one row per query
+plan: the plans of the map queries (executed on the data nodes)
+and, for distributed queries, the plan of the reduce query (that
+merges the results on the node that received the query). Each
+table access is annotated with the index that is used:
+
+FROM "PUBLIC"."PERSON" "__Z0"
+    /* PUBLIC.PERSON.__SCAN_ */                 full scan
+    /* PUBLIC.IDX_AGE: AGE > 30 */              index range
+    /* PUBLIC."_key_PK": ID = 1 */              primary key lookup
+"""
+
+_ACCESS = re.compile(
+    r"\b(?:FROM|JOIN)\s+(\"?\w+\"?\.\"?\w+\"?)(?:\s+\"?(\w+)\"?)?\s*/\*\s*(.*?)\s*\*/",
+    re.IGNORECASE | re.DOTALL)
+_WHERE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_REDUCE = re.compile(r"merge_scan|merge_sorted|\"__T\d+\"", re.IGNORECASE)
+
+
+def _unquote(name):
+    return name.replace('"', '')
+
+
+class TableAccess(object):
+    """
+    The access to a table within a query plan
+    """
+
+    def __init__(self, table, alias, index, condition, filtered):
+
+        self.table = table
+        self.alias = alias
+        """The name of the index, or None for a full scan"""
+        self.index = index
+        self.condition = condition
+        """The query filters the rows of this table"""
+        self.filtered = filtered
+
+    @property
+    def full_scan(self):
+        return self.index is None
+
+    @property
+    def missing_index(self):
+        """
+        The rows of the table are filtered, but no index is
+        used to find them
+        """
+        return self.full_scan and self.filtered
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'alias': self.alias,
+            'index': self.index,
+            'condition': self.condition,
+            'full_scan': self.full_scan,
+            'missing_index': self.missing_index,
+        }
+
+    def __repr__(self):
+        return '<TableAccess {0} {1}>'.format(self.table, self.index or 'SCAN')
+
+
+def _parse_accesses(plan):
+
+    where = _WHERE.search(plan)
+    where = where.group(1) if where else ""
+
+    accesses = []
+    for match in _ACCESS.finditer(plan):
+        table = _unquote(match.group(1))
+        alias = match.group(2)
+
+        annotation, _, condition = match.group(3).partition(":")
+        index = _unquote(annotation.strip()).rsplit(".", 1)[-1]
+        if index.upper().endswith("__SCAN_") or index.upper() == "MERGE_SCAN":
+            index = None
+
+        filtered = False
+        if index is None and where:
+            qualifier = alias or table.rsplit(".", 1)[-1]
+            filtered = re.search(r"\"?" + re.escape(qualifier) + r"\"?\.", where) is not None
+
+        accesses.append(TableAccess(table, alias, index, condition.strip() or None, filtered))
+
+    return accesses
+
+
+class QueryPlan(object):
+    """
+    Structured result of an EXPLAIN statement
+    """
+
+    def __init__(self, map_plans, reduce_plan=None):
+
+        self.map_plans = map_plans
+        self.reduce_plan = reduce_plan
+        """The table accesses of the map queries"""
+        self.accesses = []
+        for plan in map_plans:
+            self.accesses.extend(_parse_accesses(plan))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build the query plan from the rows of an EXPLAIN statement
+        """
+        map_plans = []
+        reduce_plan = None
+        for row in rows:
+            plan = str(row[0])
+            if _REDUCE.search(plan):
+                reduce_plan = plan
+            else:
+                map_plans.append(plan)
+
+        return cls(map_plans, reduce_plan)
+
+    @property
+    def full_scans(self):
+        return [access for access in self.accesses if access.full_scan]
+
+    @property
+    def missing_indexes(self):
+        return [access for access in self.accesses if access.missing_index]
+
+    @property
+    def uses_index(self):
+        return any(not access.full_scan for access in self.accesses)
+
+    def to_dict(self):
+        return {
+            'map_plans': self.map_plans,
+            'reduce_plan': self.reduce_plan,
+            'accesses': [access.to_dict() for access in self.accesses],
+        }
+
+    def __str__(self):
+        plans = list(self.map_plans)
+        if self.reduce_plan:
+            plans.append(self.reduce_plan)
+        return "\n\n".join(plans)
+
+    def __repr__(self):
+        return '<QueryPlan accesses={0} full_scans={1}>'.format(len(self.accesses), len(self.full_scans))
@@ -0,0 +1,411 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import heapq
+import logging
+import re
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+from igniteworks.client.buffer import PagedRows
+from igniteworks.client.exceptions import NotSupportedError
+
+logger = logging.getLogger(__name__)
+
+"""
+A federated context runs a query on several Apache Ignite clusters
+(e.g. one cluster per region) concurrently and merges the results;
+the merged result is streamed if the clusters stream theirs:
+
+* ORDER BY: the (sorted) results of the clusters are merged with a
+  k-way merge,
+
+* COUNT, SUM, MIN and MAX (with or without GROUP BY) are
+  re-aggregated across the clusters,
+
+* LIMIT and OFFSET: each cluster returns at most LIMIT + OFFSET
+  rows; the offset and limit are applied to the merged result,
+
+* all other queries: the results are concatenated.
+
+Metadata requests are answered by the first cluster; the clusters
+are expected to share the same schema. Federated connections are
+read-only.
+"""
+
+_READ = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+_METADATA = re.compile(r"^(?:GET|HAS) ")
+
+_SELECT_LIST = re.compile(r"^\s*SELECT\s+(?:ALL\s+)?(.*?)\s+FROM\s", re.IGNORECASE | re.DOTALL)
+_DISTINCT = re.compile(r"^\s*SELECT\s+DISTINCT\b", re.IGNORECASE)
+_GROUP_BY = re.compile(r"\bGROUP\s+BY\b", re.IGNORECASE)
+_HAVING = re.compile(r"\bHAVING\b", re.IGNORECASE)
+_ORDER_BY = re.compile(r"\bORDER\s+BY\s+(.+?)(?=\s+LIMIT\b|\s+OFFSET\b|\s*;?\s*$)", re.IGNORECASE | re.DOTALL)
+
+_PARAMETER = r"(\d+|%\(\w+\)s|%s)"
+_LIMIT = re.compile(r"\s+LIMIT\s+" + _PARAMETER + r"(?:\s+OFFSET\s+" + _PARAMETER + r")?\s*;?\s*$", re.IGNORECASE)
+
+"""An aggregate that spans a complete select item, with an optional alias"""
+_AGGREGATE = re.compile(
+    r"^(COUNT|SUM|MIN|MAX)\s*\((?!\s*DISTINCT\b)[^()]*(?:\([^()]*\)[^()]*)*\)(?:\s+(?:AS\s+)?\"?\w+\"?)?$",
+    re.IGNORECASE | re.DOTALL)
+_ANY_AGGREGATE = re.compile(
+    r"\b(?:COUNT|SUM|MIN|MAX|AVG|STDDEV\w*|VAR\w*|GROUP_CONCAT|LISTAGG|MEDIAN|BIT_\w+|BOOL_\w+|EVERY)\s*\(",
+    re.IGNORECASE)
+
+
+def _split_list(text):
+    """
+    Split a comma-separated SQL list at the top level, i.e. not
+    within parentheses or string literals
+    """
+    items = []
+    depth = 0
+    quoted = False
+    start = 0
+    for position, char in enumerate(text):
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append(text[start:position].strip())
+            start = position + 1
+
+    items.append(text[start:].strip())
+    return items
+
+
+def _parameter_value(token, parameters, positional):
+    """
+    The value of a LIMIT or OFFSET token (number or parameter)
+    """
+    if token.isdigit():
+        return int(token)
+
+    if token == "%s":
+        return int(positional.pop(0))
+
+    return int(parameters[token[2:-2]])
+
+
+def push_down_limit(stmt, parameters=None, push_down=True):
+    """
+    Rewrite `LIMIT n OFFSET m` into `LIMIT n + m`, so that each
+    cluster returns the rows that are required for the global
+    result, or remove it if it cannot be pushed down; returns
+    (statement, parameters, limit, offset)
+    """
+    match = _LIMIT.search(stmt)
+    if not match:
+        return stmt, parameters, None, 0
+
+    tokens = [token for token in match.groups() if token]
+    positional = None
+    if isinstance(parameters, (list, tuple)):
+        """LIMIT and OFFSET are the last positional parameters"""
+        count = sum(1 for token in tokens if token == "%s")
+        positional = list(parameters[len(parameters) - count:])
+        parameters = list(parameters[:len(parameters) - count])
+
+    limit = _parameter_value(tokens[0], parameters, positional)
+    offset = _parameter_value(tokens[1], parameters, positional) if len(tokens) > 1 else 0
+
+    stmt = stmt[:match.start()]
+    if push_down:
+        stmt += " LIMIT " + str(limit + offset)
+
+    return stmt, parameters, limit, offset
+
+
+class _Descending(object):
+    """
+    Sort key wrapper that reverses the order of a value
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _null_key(value):
+    """NULL values are sorted first (ascending)"""
+    return (value is not None, value)
+
+
+def _column_position(expression, cols):
+    """
+    The position of an ORDER BY or select list expression within
+    the result columns, or None if it cannot be resolved
+    """
+    expression = expression.strip()
+    if expression.isdigit():
+        return int(expression) - 1
+
+    name = expression.replace('"', '').rsplit(".", 1)[-1].upper()
+    names = [str(col).upper() for col in cols]
+
+    return names.index(name) if name in names else None
+
+
+def order_key(stmt, cols):
+    """
+    Build the sort key function of the ORDER BY clause of a
+    statement, or None if the statement has no (resolvable)
+    ORDER BY clause
+    """
+    match = _ORDER_BY.search(stmt)
+    if not match:
+        return None
+
+    positions = []
+    for item in _split_list(match.group(1)):
+        tokens = item.split()
+        descending = len(tokens) > 1 and tokens[1].upper() == "DESC"
+
+        position = _column_position(tokens[0], cols)
+        if position is None:
+            logger.warning("ORDER BY %s cannot be merged; results are concatenated", item)
+            return None
+        positions.append((position, descending))
+
+    def key(row):
+        values = []
+        for position, descending in positions:
+            value = _null_key(row[position])
+            values.append(_Descending(value) if descending else value)
+        return values
+
+    return key
+
+
+def aggregation(stmt):
+    """
+    Determine the re-aggregation of a statement: None for plain
+    queries, or the list of (function or None) per select item,
+    where None marks a grouping column
+    """
+    has_group_by = _GROUP_BY.search(stmt) is not None
+
+    match = _SELECT_LIST.match(stmt)
+    if not match:
+        return None
+
+    functions = []
+    for item in _split_list(match.group(1)):
+        aggregate = _AGGREGATE.match(item)
+        if aggregate:
+            functions.append(aggregate.group(1).upper())
+        elif _ANY_AGGREGATE.search(item):
+            functions.append("UNSUPPORTED")
+        else:
+            functions.append(None)
+
+    if not has_group_by and all(function is None for function in functions):
+        return None
+
+    if "UNSUPPORTED" in functions or _HAVING.search(stmt) or _DISTINCT.match(stmt):
+        raise NotSupportedError("Only COUNT, SUM, MIN and MAX can be aggregated across clusters.")
+
+    if not has_group_by and None in functions:
+        raise NotSupportedError("Aggregates without GROUP BY cannot be combined with columns.")
+
+    return functions
+
+
+def _combine(function, current, value):
+
+    if value is None:
+        return current
+    if current is None:
+        return value
+
+    if function in ("COUNT", "SUM"):
+        return current + value
+    if function == "MIN":
+        return min(current, value)
+
+    return max(current, value)
+
+
+def reaggregate(functions, results):
+    """
+    Combine the aggregated rows of the clusters
+    """
+    groups = {}
+    for rows in results:
+        for row in rows:
+            group = tuple(value for value, function in zip(row, functions) if function is None)
+            current = groups.get(group)
+            if current is None:
+                groups[group] = list(row)
+                continue
+
+            for position, function in enumerate(functions):
+                if function is not None:
+                    current[position] = _combine(function, current[position], row[position])
+
+    return [tuple(row) for row in groups.values()]
+
+
+def _close(results):
+    """
+    Close the results of the clusters, e.g. their server-side
+    query cursors or spilled rows
+    """
+    for rows in results:
+        if hasattr(rows, "close"):
+            rows.close()
+
+
+def _stream(rows, results):
+    """
+    Stream the merged rows; the results of the clusters are
+    closed when the stream is exhausted or closed
+    """
+    try:
+        for row in rows:
+            yield row
+    finally:
+        _close(results)
+
+
+class FederatedContext(object):
+    """
+    Connection context over several Apache Ignite clusters
+    """
+
+    def __init__(self,
+                 # list of (name, context) pairs, one per cluster
+                 contexts,
+                 # (optional) number of rows per page of merged results
+                 page_size=1024):
+
+        self._names = [name for name, _ in contexts]
+        self._contexts = [context for _, context in contexts]
+        self._page_size = page_size
+
+        self._executor = ThreadPoolExecutor(max_workers=len(self._contexts),
+                                            thread_name_prefix="igniteworks-federation")
+
+    def _fan_out(self, stmt, parameters):
+        """
+        Run a statement on all clusters concurrently
+        """
+        futures = [self._executor.submit(context.sql, stmt, parameters) for context in self._contexts]
+
+        responses = []
+        for name, future in zip(self._names, futures):
+            try:
+                responses.append(future.result())
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                logger.error("Federated query failed on cluster %s: %s", name, e)
+                raise
+
+        return responses
+
+    def sql(self, stmt, parameters=None, bulk_parameters=None):
+        """
+        Execute a query on all clusters and merge the results
+        """
+        if stmt is None:
+            return None
+
+        if _METADATA.match(stmt):
+            return self._contexts[0].sql(stmt, parameters, bulk_parameters)
+
+        if bulk_parameters is not None or not _READ.match(stmt):
+            raise NotSupportedError("Federated connections support queries only.")
+
+        functions = aggregation(stmt)
+        """
+        The limit of an aggregation applies to the combined groups;
+        the clusters must therefore return all of their groups
+        """
+        stmt, parameters, limit, offset = push_down_limit(stmt, parameters,
+                                                          push_down=functions is None)
+
+        responses = self._fan_out(stmt, parameters)
+        cols = responses[0].get("cols", [])
+
+        results = [response.get("rows", []) for response in responses]
+        """
+        The merged result is only streamed if a cluster streams its
+        result from an open server-side query cursor
+        """
+        streamed = functions is None and any(
+            getattr(result, "exhausted", True) is False for result in results)
+
+        key = order_key(stmt, cols)
+        if functions is not None:
+            try:
+                rows = reaggregate(functions, results)
+            finally:
+                _close(results)
+            if key is not None:
+                rows.sort(key=key)
+
+        elif key is not None:
+            rows = heapq.merge(*[iter(result) for result in results], key=key)
+        else:
+            rows = chain.from_iterable(results)
+
+        if limit is not None or offset:
+            rows = islice(rows, offset, offset + limit if limit is not None else None)
+
+        if streamed:
+            rows = PagedRows(_stream(rows, results), self._page_size)
+        else:
+            try:
+                rows = list(rows)
+            finally:
+                _close(results)
+
+        return {
+            'cols': cols,
+            'rows': rows,
+        }
+
+    def node_stats(self):
+        """
+        Return the node statistics of all clusters by cluster name
+        """
+        return {name: context.node_stats() for name, context in zip(self._names, self._contexts)}
+
+    def close(self):
+
+        self._executor.shutdown(wait=False)
+        for context in self._contexts:
+            context.close()
+
+    def __repr__(self):
+        return '<FederatedContext {0}>'.format(", ".join(self._names))
@@ -17,14 +17,35 @@
 # @author Stefan Krusche, Dr. Krusche & Partner PartG
 #
 
+import json
 import logging
 import re
-
-from pyignite import Client
-
-from igniteworks.client.exceptions import ProgrammingError
+import time
+
+from igniteworks.client.balancing import node_load
+from igniteworks.client.buffer import PagedRows, RowBuffer
+from igniteworks.client.exceptions import IgniteConnectionError, NotSupportedError, ProgrammingError
+from igniteworks.client.explain import QueryPlan
+from igniteworks.client.keyset import group_keys, parse_keyset, remove_keys
+from igniteworks.client.nearcache import open_near_caches, parse_select
+from igniteworks.client.profiling import stage
+from igniteworks.client.registry import binary_type_registry
+from igniteworks.client.resilience import TranslatedCursor, backoff, circuit_breaker, is_connection_error, \
+    is_read_only, is_schema_error, is_server_error, translate_error
+from igniteworks.client.routing import bind_parameters, key_hint, key_values, sql_on_node, statement_table
+from igniteworks.client.schema import SchemaSnapshot
+from igniteworks.client.subscription import Subscription
+from igniteworks.client.writer import BulkWriter, bulk_insert_rows, multi_row_statements
 
 logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("igniteworks.slowlog")
+
+_SELECT = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+_DML = re.compile(r"^\s*(?:INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+_KEYSET_DML = re.compile(r"^\s*(?:UPDATE|DELETE)\b", re.IGNORECASE)
+_MERGE = re.compile(r"^\s*MERGE\b", re.IGNORECASE)
+_INSERT = re.compile(r"^\s*INSERT\b", re.IGNORECASE)
+_DDL = re.compile(r"^\s*(?:CREATE|ALTER|DROP)\b", re.IGNORECASE)
 
 """
 'query_fields': [
@@ -92,6 +113,19 @@ def _columns_from_entity(entity):
 # leveraging pyignite
 #
 
+def _pseudo_schema(stmt):
+    """
+    Split the (optional) WITH <schema> suffix off a pseudo
+    statement
+    """
+    schema = None
+    if " WITH " in stmt:
+        stmt, schema = stmt.split(" WITH ", 1)
+        schema = schema.strip()
+
+    return stmt, schema
+
+
 def clean_stmt(stmt):
     """
     Apache Superset tests a specified schema, table & field
@@ -180,6 +214,67 @@ class IgniteContext(object):
                  username=None,
                  # password to authenticate to Ignite cluster.
                  password=None,
+                 # (optional) number of result rows kept in memory; further rows
+                 # are spilled to a temporary file. Default is None (no spilling).
+                 spill_threshold=None,
+                 # (optional) cursor page size. Default is 1024, which means that
+                 # client makes one server call per 1024 rows.
+                 page_size=1024,
+                 # (optional) number of result pages cached for scrolling; if set,
+                 # query results are streamed page by page instead of being fetched
+                 # completely. Default is None (no streaming).
+                 page_cache=None,
+                 # (optional) path of a local schema snapshot file; the snapshot
+                 # serves table and column metadata immediately and is revalidated
+                 # against the cluster in the background. Default is None.
+                 schema_snapshot=None,
+                 # (optional) list of (host, port) pairs of all Ignite nodes to
+                 # connect to; statements with key predicates are routed to the
+                 # node that owns the key(s). Default is None (host and port).
+                 nodes=None,
+                 # (optional) number of rows per `put_all` request of bulk MERGE writes,
+                 # and per multi-row statement of bulk INSERT writes. Default is 1000.
+                 batch_size=1000,
+                 # (optional) number of nodes that are written concurrently by
+                 # bulk writes. Default is 4.
+                 batch_concurrency=4,
+                 # (optional) number of retries of read-only statements and metadata
+                 # requests after a connection failure. Default is 2.
+                 retries=2,
+                 # (optional) base delay (in seconds) of the jittered exponential
+                 # backoff between two retries. Default is 0.1 seconds.
+                 retry_backoff=0.1,
+                 # (optional) number of consecutive connection failures that open
+                 # the circuit breaker of the cluster. Default is 5.
+                 breaker_threshold=5,
+                 # (optional) seconds an open circuit rejects requests before a
+                 # trial request is sent. Default is 30.0 seconds.
+                 breaker_timeout=30.0,
+                 # (optional) list of REPLICATED tables ([<schema>.]<table>) that are
+                 # kept in local memory; simple equality SELECTs on these tables are
+                 # answered without network round trip. Default is None.
+                 near_cache=None,
+                 # (optional) seconds between two version checks of a near cache.
+                 # Default is 60.0 seconds.
+                 near_cache_ttl=60.0,
+                 # (optional) latency (in seconds) above which statements are logged
+                 # to the `igniteworks.slowlog` logger. Default is None (no logging).
+                 slow_query_threshold=None,
+                 # (optional) capture the query plan of slow SELECT statements.
+                 # Default is True.
+                 slow_query_plan=True,
+                 # (optional) seconds the statistics of a table are cached.
+                 # Default is 10.0 seconds.
+                 stats_ttl=10.0,
+                 # (optional) minimum number of keys of a DELETE or UPDATE with an IN
+                 # list on the key column that is executed as key-set DML. Default
+                 # is 1000; None disables key-set DML. The row count of a key-set
+                 # DELETE is the number of distinct keys, including keys that did
+                 # not exist.
+                 keyset_threshold=1000,
+                 # (optional) number of keys per `remove_keys` request or UPDATE
+                 # statement of key-set DML. Default is 1000.
+                 keyset_chunk_size=1000,
                  ):
 
         kw_args = {
@@ -197,21 +292,205 @@ class IgniteContext(object):
             'password': password
         }
 
+        self._kw_args = kw_args
+        self._spill_threshold = spill_threshold
+        self._page_size = page_size
+        self._page_cache = page_cache
+        self._nodes = list(nodes) if nodes else [(host, port)]
+        """The cache and key column of the tables, used for routing"""
+        self._routes = {}
+        """The bulk writers of the tables"""
+        self._writers = {}
+        self._batch_size = batch_size
+        self._batch_concurrency = batch_concurrency
+
+        """The cached table statistics: (schema, table) -> (expiry, statistics)"""
+        self._stats = {}
+        self._stats_ttl = stats_ttl
+
+        self._keyset_threshold = keyset_threshold
+        self._keyset_chunk_size = keyset_chunk_size
+
+        self._slow_query_threshold = slow_query_threshold
+        self._slow_query_plan = slow_query_plan
+
+        self._retries = retries
+        self._retry_backoff = retry_backoff
+        """The circuit breaker is shared by all contexts of the cluster"""
+        self._breaker = circuit_breaker(self._nodes, breaker_threshold, breaker_timeout)
+        """The node load is shared by all contexts of the cluster"""
+        self._load = node_load(self._nodes)
+        """The binary types are shared by all clients of the cluster"""
+        self._types = binary_type_registry(self._nodes)
+
         """The reference to the Ignite Thin client"""
-        self.client = Client(**kw_args)
-        self.client.connect(host, port)
+        self.client = None
+
+        self._breaker.before()
+        try:
+            self._reconnect()
+        except Exception as e:
+            error = self._failure(e)
+            if error is e:
+                raise
+            raise error from e
+
+        self._breaker.success()
+
+        self._snapshot = None
+        if schema_snapshot:
+            self._snapshot = SchemaSnapshot.open(schema_snapshot)
+            self._snapshot.revalidate_async(self._connect)
+
+        """The near caches of the (REPLICATED) tables"""
+        self._near_caches = {}
+        if near_cache:
+            self._near_caches = open_near_caches(self.client, self.find_table, self._nodes,
+                                                 near_cache, self._connect, near_cache_ttl)
+
+    def _connect(self):
+        """
+        Create a new Ignite Thin client that is connected to
+        the configured Ignite node
+        """
+        """pyignite is imported when the first client is created"""
+        from pyignite import Client
+
+        client = self._types.attach(Client(**self._kw_args))
+        client.connect(self._nodes)
+
+        return client
+
+    def _reconnect(self):
+        """
+        Replace the Ignite Thin client with a new one
+        """
+        self.close()
+        self.client = self._connect()
+
+        """Routes and writers refer to the previous client"""
+        self._routes = {}
+        self._writers = {}
+
+    def _failure(self, error):
+        """
+        Record a connection failure with the circuit breaker and
+        return the respective DB-API exception
+        """
+        if is_connection_error(error):
+            self._breaker.failure()
+            self.close()
+        elif is_server_error(error):
+            """An error reported by the cluster proves that it is reachable"""
+            self._breaker.success()
+        else:
+            self._breaker.inconclusive()
+
+        if is_schema_error(error):
+            self._types.invalidate()
+
+        return translate_error(error)
 
     def close(self):
         if self.client:
-            self.client.close()
+            try:
+                self.client.close()
+            except Exception as e:
+                logger.debug("Ignite client cannot be closed: %s", e)
+            self.client = None
 
     def sql(self, stmt, parameters=None, bulk_parameters=None):
         """
         Execute SQL statement against Apache Ignite cluster.
+
+        Errors of the Ignite Thin client are translated into DB-API
+        exceptions. After a connection failure, the client is replaced
+        and read-only statements are retried with a jittered backoff.
         """
         if stmt is None:
             return None
 
+        retryable = bulk_parameters is None and is_read_only(stmt)
+
+        start = time.perf_counter()
+
+        attempt = 0
+        while True:
+            self._breaker.before()
+            try:
+                if self.client is None:
+                    self._reconnect()
+
+                response = self._sql(stmt, parameters, bulk_parameters)
+
+            except Exception as e:
+                error = self._failure(e)
+                if error is e:
+                    raise
+
+                if not isinstance(error, IgniteConnectionError) or \
+                        not retryable or attempt >= self._retries:
+                    raise error from e
+
+                delay = backoff(attempt, self._retry_backoff)
+                logger.info("Connection failure (%s); retry %d in %.3f seconds", e, attempt + 1, delay)
+
+                with stage("retry_wait"):
+                    time.sleep(delay)
+                attempt += 1
+                continue
+
+            self._breaker.success()
+            """
+            DDL statements change the binary types and the metadata
+            of tables, and thereby their routes and bulk writers
+            """
+            if _DDL.match(stmt):
+                self._types.invalidate()
+                self._routes = {}
+                self._writers = {}
+                if self._snapshot is not None:
+                    self._snapshot.invalidate()
+                    self._snapshot.revalidate_async(self._connect)
+
+            if self._slow_query_threshold is not None:
+                duration = time.perf_counter() - start
+                if duration >= self._slow_query_threshold:
+                    self._log_slow_query(stmt, parameters, bulk_parameters, duration)
+
+            return response
+
+    def _log_slow_query(self, stmt, parameters, bulk_parameters, duration):
+        """
+        Log a slow statement as JSON document, including the query
+        plan of SELECT statements
+        """
+        record = {
+            'sql': stmt,
+            'parameters': parameters if bulk_parameters is None else bulk_parameters,
+            'duration_ms': round(duration * 1000, 3),
+        }
+
+        if self._slow_query_plan and _SELECT.match(stmt):
+            try:
+                plan = self.explain(stmt, parameters)
+                record['plan'] = plan.to_dict()
+                record['full_scans'] = [access.table for access in plan.full_scans]
+
+            except Exception as e:
+                record['plan_error'] = str(e)
+
+        slow_query_logger.warning(json.dumps(record, default=str))
+
+    def explain(self, stmt, parameters=None):
+        """
+        Retrieve the (map and reduce) query plan of an SQL statement
+        """
+        response = self.sql("EXPLAIN " + clean_stmt(stmt), parameters)
+        return QueryPlan.from_rows(response.get("rows", []))
+
+    def _sql(self, stmt, parameters=None, bulk_parameters=None):
+
         ############################################################
         #
         # GET CACHES
@@ -223,7 +502,7 @@ class IgniteContext(object):
             database request
             """
             cache_names = self.get_schema_names()
-            rows = [[cache_name] for cache_name in cache_names]
+            rows = [(cache_name,) for cache_name in cache_names]
             response = {
                 'cols': ['name'],
                 'rows': rows
@@ -243,7 +522,7 @@ class IgniteContext(object):
                 schema = stmt.split("FROM", 1)[1].strip()
 
             table_names = self.get_table_names(schema)
-            rows = [[table_name] for table_name in table_names]
+            rows = [(table_name,) for table_name in table_names]
             response = {
                 'cols': ['name'],
                 'rows': rows
@@ -275,7 +554,7 @@ class IgniteContext(object):
 
             rows = []
             for column in columns:
-                values = [
+                values = (
                     column.get("name"),
                     column.get("alias"),
                     column.get("type"),
@@ -283,7 +562,7 @@ class IgniteContext(object):
                     column.get("is_nullable"),
                     column.get("precision"),
                     column.get("scale"),
-                ]
+                )
                 rows.append(values)
 
             response = {
@@ -318,7 +597,7 @@ class IgniteContext(object):
             rows = []
             for column in columns:
                 if column.get("is_key") == "true":
-                    rows.append([column.get("name")])
+                    rows.append((column.get("name"),))
 
             response = {
                 'cols': ['name', ],
@@ -327,57 +606,472 @@ class IgniteContext(object):
 
             return response
 
-        else:
+        ############################################################
+        #
+        # GET STATS
+        #
+        #############################################################
+
+        elif stmt.startswith("GET STATS"):
+            stmt, schema = _pseudo_schema(stmt)
+            table = stmt.split("FROM", 1)[1].strip()
+
+            stats = self.get_table_stats(table, schema)
+            return {
+                'cols': list(stats.keys()),
+                'rows': [tuple(stats.values())],
+            }
+
+        ############################################################
+        #
+        # HAS SCHEMA, HAS TABLE, HAS INDEX
+        #
+        #############################################################
+
+        elif stmt.startswith("HAS SCHEMA"):
+            schema = stmt.split("HAS SCHEMA", 1)[1].strip()
+            return {'cols': ['exists'], 'rows': [(self.has_schema(schema),)]}
+
+        elif stmt.startswith("HAS TABLE"):
+            stmt, schema = _pseudo_schema(stmt)
+            table = stmt.split("HAS TABLE", 1)[1].strip()
+
+            return {'cols': ['exists'], 'rows': [(self.has_table(table, schema),)]}
+
+        elif stmt.startswith("HAS INDEX"):
+            stmt, schema = _pseudo_schema(stmt)
+            index, table = stmt.split("HAS INDEX", 1)[1].split(" ON ", 1)
+
+            return {'cols': ['exists'], 'rows': [(self.has_index(table.strip(), index.strip(), schema),)]}
+
+        elif bulk_parameters is not None:
             stmt = clean_stmt(stmt)
-            result = self.client.sql(
-                stmt,
-                #
-                # (optional) cursor page size. Default is 1024, which
-                # means that client makes one server call per 1024 rows
-                #
-                page_size=1024,
-                #
-                # (optional) include field names in result. Default is false
-                #
-                include_field_names=True)
+            try:
+                return self._sql_bulk(stmt, bulk_parameters)
+            finally:
+                self._invalidate_near_caches(stmt)
+
+        else:
+            with stage("clean_stmt"):
+                stmt = clean_stmt(stmt)
+            with stage("bind"):
+                stmt, args = bind_parameters(stmt, parameters)
+
+            if self._near_caches:
+                response = self._near_select(stmt, args)
+                if response is not None:
+                    return response
             """
-            The sql method generates a list of columns in the first
-            yield. This can be accessed with the __next__ function
+            Writes to near-cached tables invalidate the near caches
+            after the write, so that a reload cannot miss it
             """
-            field_names = next(result)
+            try:
+                if self._keyset_threshold and _KEYSET_DML.match(stmt):
+                    response = self._sql_keyset(stmt, args)
+                    if response is not None:
+                        return response
+
+                with stage("route"):
+                    node = self._route(stmt, args)
+                    if node is None:
+                        node = self._least_loaded()
+
+                return self._execute(node, stmt, args, measure=True)
+            finally:
+                self._invalidate_near_caches(stmt)
+
+    def _execute(self, node, stmt, args, measure=False):
+        """
+        Execute a (bound) SQL statement on a certain node, or on
+        any node if None, and build the response
+        """
+        """
+        The latency and in-flight count of the node determine the
+        node of subsequent queries; only the request and its first
+        page are measured, as the size of a result says nothing
+        about the load of the node that serves it
+        """
+        key = (node.host, node.port) if measure and node is not None else None
+        start = self._load.begin(key) if key is not None else None
+        try:
+            with stage("request"):
+                if node is not None:
+                    result = sql_on_node(self.client, node, stmt,
+                                         page_size=self._page_size,
+                                         query_args=args,
+                                         include_field_names=True)
+                else:
+                    result = self.client.sql(
+                        stmt,
+                        #
+                        # (optional) cursor page size. Default is 1024, which
+                        # means that client makes one server call per 1024 rows
+                        #
+                        page_size=self._page_size,
+                        #
+                        # (optional) query arguments
+                        #
+                        query_args=args,
+                        #
+                        # (optional) include field names in result. Default is false
+                        #
+                        include_field_names=True)
+                """
+                The sql method generates a list of columns in the first
+                yield. This can be accessed with the __next__ function;
+                the request has then been sent and the first page
+                received
+                """
+                field_names = next(result)
+        except Exception as error:
+            """Only connection errors say something about the health of a node"""
+            if key is not None:
+                failed = is_connection_error(error)
+                self._load.end(key, start, failed=failed, sample=False)
+            raise
+
+        if key is not None:
+            self._load.end(key, start)
+        """
+        The rows are retained as (immutable) tuples; they are more
+        compact than the lists provided by pyignite
+        """
+        dml = _DML.match(stmt) is not None
+        with stage("rows"):
+            if dml:
+                """
+                DML statements return a single row with the number of
+                affected rows; it is never streamed or spilled
+                """
+                rows = list(map(tuple, result))
 
-            rows = []
-            for values in result:
-                rows.append(values)
+            elif self._page_cache:
+                """
+                The rows are fetched from the (open) server-side
+                cursor when they are accessed
+                """
+                rows = PagedRows(TranslatedCursor(result), self._page_size, self._page_cache)
 
-            response = {
-                'cols': field_names,
-                'rows': rows
+            elif self._spill_threshold:
+                rows = RowBuffer(self._spill_threshold)
+                rows.extend(map(tuple, result))
+                rows.seal()
+
+            else:
+                rows = list(map(tuple, result))
+
+        response = {
+            'cols': field_names,
+            'rows': rows
+        }
+        """
+        DML statements return the number of affected rows
+        """
+        if dml and len(rows) == 1 and len(rows[0]) == 1:
+            response['rowcount'] = rows[0][0]
+
+        return response
+
+    def _sql_keyset(self, stmt, args):
+        """
+        Execute a DELETE or UPDATE with a large IN list on the key
+        of a table with a single-column key as key-set DML; None is
+        returned if the statement does not qualify.
+
+        Deleted keys are removed with `remove_keys`, which does not
+        report whether a key existed; the row count of a DELETE is
+        therefore the number of distinct keys that were sent.
+        """
+        keyset = parse_keyset(stmt, args)
+        if keyset is None:
+            return None
+
+        head, head_args, schema, table_name, key_column, keys = keyset
+        if len(keys) < self._keyset_threshold:
+            return None
+
+        route = self._routing_info(schema, table_name)
+        if route is None or route[1].upper() != key_column.upper():
+            return None
+
+        cache_name, _, hint = route
+        if head is None:
+            with stage("remove_keys"):
+                count = remove_keys(self.client, cache_name, hint, list(dict.fromkeys(keys)),
+                                    self._keyset_chunk_size)
+
+            return {
+                'cols': ['UPDATED'],
+                'rows': [(count,)],
+                'rowcount': count,
             }
-            return response
+        """
+        Each chunk refers to the keys of a single node and is
+        executed by that node
+        """
+        count = 0
+        for node, node_keys in group_keys(self.client, cache_name, hint, keys).items():
+            for i in range(0, len(node_keys), self._keyset_chunk_size):
+                chunk = node_keys[i:i + self._keyset_chunk_size]
+                chunk_stmt = head + " WHERE " + key_column + " IN (" + ", ".join(["?"] * len(chunk)) + ")"
+
+                response = self._execute(node, chunk_stmt, head_args + chunk)
+                count += response.get("rowcount", 0)
+
+        return {
+            'cols': ['UPDATED'],
+            'rows': [(count,)],
+            'rowcount': count,
+        }
+
+    def _near_select(self, stmt, args):
+        """
+        Answer a simple equality SELECT on a near-cached table
+        from local memory; None is returned otherwise
+        """
+        select = parse_select(stmt, args)
+        if select is None:
+            return None
+
+        schema, table_name, columns, predicates = select
+        near_cache = self._near_caches.get((schema or "PUBLIC", table_name))
+        if near_cache is None:
+            return None
+
+        return near_cache.select(columns, predicates)
+
+    def _invalidate_near_caches(self, stmt):
+        """
+        Writes to a near-cached table trigger the reload of its
+        near cache
+        """
+        if not self._near_caches or not _DML.match(stmt):
+            return
+
+        for (_, table_name), near_cache in self._near_caches.items():
+            if re.search(r"\b" + table_name + r"\b", stmt, re.IGNORECASE):
+                near_cache.invalidate()
 
-    def _columns_from_cache(self, table_name, cache_name):
+    def _sql_bulk(self, stmt, bulk_parameters):
+        """
+        Execute a statement for a sequence of parameter sets; plain
+        MERGE statements into tables with a single-column key are
+        written with the partition-aware bulk writer.
+
+        INSERT statements are always executed as SQL, as `put_all`
+        overwrites existing keys and cannot raise an IntegrityError
+        for duplicate keys: plain INSERT ... VALUES statements are
+        sent as multi-row INSERT statements of up to `batch_size`
+        rows, i.e. one round trip per chunk.
+        """
+        bulk_parameters = list(bulk_parameters)
+
+        bulk = bulk_insert_rows(stmt, bulk_parameters) if _MERGE.match(stmt) else None
+        if bulk is not None:
+            schema, table_name, rows = bulk
+            try:
+                writer = self._bulk_writer(table_name.upper(), schema)
+            except ProgrammingError as e:
+                logger.debug("Bulk writer not applicable: %s", e)
+                writer = None
+
+            if writer is not None:
+                count = writer.write(rows)
+                return {
+                    'cols': [],
+                    'rows': [],
+                    'results': [{'rowcount': count}],
+                }
+
+        statements = multi_row_statements(stmt, bulk_parameters, self._batch_size) \
+            if _INSERT.match(stmt) else None
+        if statements is not None:
+            results = []
+            for chunk_stmt, chunk_parameters in statements:
+                response = self._sql(chunk_stmt, chunk_parameters)
+                results.append({'rowcount': response.get('rowcount', -1)})
+
+            return {
+                'cols': [],
+                'rows': [],
+                'results': results,
+            }
+
+        results = []
+        for parameters in bulk_parameters:
+            response = self._sql(stmt, parameters)
+            results.append({'rowcount': response.get('rowcount', -1)})
+
+        return {
+            'cols': [],
+            'rows': [],
+            'results': results,
+        }
+
+    def _bulk_writer(self, table_name, schema=None):
+
+        key = (schema, table_name)
+        if key not in self._writers:
+            cache_name, entity = self.find_table(table_name, schema)
+            if entity is None:
+                raise ProgrammingError("Table " + table_name + " does not exist.")
+
+            self._writers[key] = BulkWriter(self.client, cache_name, entity,
+                                            batch_size=self._batch_size,
+                                            concurrency=self._batch_concurrency)
+
+        return self._writers[key]
+
+    def bulk_put(self, table_name, rows, schema=None):
+        """
+        Write rows (dictionaries of column names and values) into
+        a table with a single-column key: the rows are grouped by
+        the primary node of their keys and sent in `put_all`
+        batches to the nodes in parallel. Existing keys are
+        overwritten. Returns the number of written rows.
+        """
+        return self._bulk_writer(table_name, schema).write(rows)
 
-        columns = []
+    def _cache_names(self):
+        """
+        Retrieve the cache names from the schema snapshot, if
+        available, or from the Ignite cluster
+        """
+        if self._snapshot is not None:
+            """Revalidate a stale or outdated snapshot in the background"""
+            self._snapshot.revalidate_async(self._connect)
+            if self._snapshot.fresh:
+                return self._snapshot.cache_names()
+
+        return self.client.get_cache_names()
+
+    def _cache_entities(self, cache_name):
+        """
+        Retrieve the query entities (settings key '200') of a
+        certain cache from the schema snapshot, if available, or
+        from the cache configuration; None is returned if the
+        cache does not define query entities
+        """
+        if self._snapshot is not None and self._snapshot.fresh and self._snapshot.knows(cache_name):
+            return self._snapshot.entities(cache_name)
 
         cfg = self.client.get_cache(cache_name).settings
-        if 200 in cfg:
-            entities = cfg.get(200)
+        return cfg.get(200)
+
+    def _route(self, stmt, args):
+        """
+        Determine the node that owns the key partition(s) of a
+        statement with an equality or IN predicate on the key of
+        its table; None is returned if the statement cannot be
+        routed
+        """
+        if len(self._nodes) < 2:
+            return None
+
+        table = statement_table(stmt)
+        if table is None:
+            return None
+
+        route = self._routing_info(*table)
+        if route is None:
+            return None
+
+        cache_name, key_column, hint = route
+
+        values = key_values(stmt, args, key_column)
+        if not values:
+            return None
+
+        try:
+            nodes = set()
+            for value in values:
+                nodes.add(self.client.get_best_node(cache_name, value, hint))
+
+        except Exception as e:
+            logger.debug("Statement cannot be routed: %s", e)
+            return None
+        """The statement is routed only if all keys share the same node"""
+        return nodes.pop() if len(nodes) == 1 else None
+
+    def _least_loaded(self):
+        """
+        Determine the healthy node with the lowest expected latency
+        for a statement that is not routed; None is returned for a
+        single-node setup or if no node is connected
+        """
+        if len(self._nodes) < 2:
+            return None
+
+        alive = {(node.host, node.port): node for node in self.client._nodes if node.alive}
+        if not alive:
+            return None
+
+        return alive[self._load.select(list(alive.keys()))]
+
+    def node_stats(self):
+        """
+        Return the latency (EWMA), in-flight count, request and error
+        count of each node that executed SQL queries of this process
+        """
+        return self._load.stats()
+
+    def _routing_info(self, schema, table_name):
+        """
+        Retrieve the cache name, the key column and the key type
+        hint of a table with a single-column (primitive) key
+        """
+        table_name = table_name.upper()
+        if (schema, table_name) in self._routes:
+            return self._routes[(schema, table_name)]
+
+        route = None
+
+        cache_name, entity = self.find_table(table_name, schema)
+        if entity is not None:
+            key_fields = [query_field for query_field in entity.get("query_fields")
+                          if query_field.get("is_key_field")]
+
+            if len(key_fields) == 1 and \
+                    key_fields[0].get("type_name") == entity.get("key_type_name"):
+                hint = key_hint(key_fields[0].get("type_name"))
+                if hint is not None:
+                    route = (cache_name, key_fields[0].get("name"), hint)
+
+        self._routes[(schema, table_name)] = route
+        return route
+
+    def _entity_from_cache(self, table_name, cache_name):
+
+        entities = self._cache_entities(cache_name)
+        if entities is not None:
             for entity in entities:
                 tableName = entity.get("table_name")
                 if table_name == tableName:
-                    columns = _columns_from_entity(entity)
-                    break
+                    self._warm_types(entity)
+                    return entity
 
-        return columns
+        return None
 
-    def get_columns(self, table_name, schema=None):
+    def _warm_types(self, entity):
         """
-        Retrieve the cache configuration that refers to
-        the provided table_name (and schema)
+        Retrieve the binary types of the key and value of a table
+        (once per process), so that no client has to retrieve them
+        while decoding or writing
+        """
+        if self.client is None:
+            return
+
+        type_names = [entity.get("key_type_name"), entity.get("value_type_name")]
+        self._types.warm(self.client, [type_name for type_name in type_names
+                                       if type_name and not type_name.startswith("java.")])
+
+    def find_table(self, table_name, schema=None):
         """
-        columns = []
-        cache_names = self.client.get_cache_names()
+        Retrieve the cache name and query entity that refer to
+        the provided table_name (and schema); (None, None) is
+        returned if no cache defines the table
+        """
+        cache_names = self._cache_names()
         if schema:
             """
             Check whether the provided schema refers
@@ -385,10 +1079,19 @@ class IgniteContext(object):
             """
             is_cache = any(schema in cache_name for cache_name in cache_names)
             if is_cache:
-                columns = self._columns_from_cache(table_name, schema)
-                """Check whether columns are not empty"""
-                if len(columns) != 0:
-                    return columns
+                entity = self._entity_from_cache(table_name, schema)
+                if entity is not None:
+                    return schema, entity
+        """
+        Tables created with SQL DDL are stored in caches that are
+        named SQL_<SCHEMA>_<TABLE>; this cache is checked before
+        all caches are searched
+        """
+        cache_name = "SQL_" + (schema or "PUBLIC").upper() + "_" + table_name.upper()
+        if cache_name in cache_names:
+            entity = self._entity_from_cache(table_name, cache_name)
+            if entity is not None:
+                return cache_name, entity
 
         """ 
         The provided schema does not exist or the table name does not
@@ -396,12 +1099,239 @@ class IgniteContext(object):
         from the provided table name
         """
         for cache_name in cache_names:
-            columns = self._columns_from_cache(table_name, cache_name)
-            """Check whether columns are not empty"""
-            if len(columns) != 0:
-                return columns
+            entity = self._entity_from_cache(table_name, cache_name)
+            if entity is not None:
+                return cache_name, entity
+
+        return None, None
+
+    def _cache_entities_or_none(self, cache_name):
+        """
+        Retrieve the query entities of a single cache that may
+        not exist; None is returned for unknown caches
+        """
+        from pyignite.exceptions import CacheError
+
+        try:
+            return self._cache_entities(cache_name)
+        except CacheError:
+            return None
+
+    def _locate_table(self, table_name, schema=None):
+        """
+        Resolve a single table to (cache name, query entity) with
+        as few round trips as possible; the table name is matched
+        as unquoted (upper case) name first, and then as provided.
+
+        A fresh schema snapshot is searched locally first; tables
+        that are not in the snapshot (e.g. created after startup)
+        are looked up in the cluster: the cache configurations of
+        the schema (as cache name) and of the SQL_<SCHEMA>_<TABLE>
+        cache are fetched, and then the SYS.TABLES system view is
+        queried. Only clusters without system views are crawled.
+        """
+        table_names = [table_name.upper()]
+        if table_name != table_name.upper():
+            table_names.append(table_name)
+
+        if self._snapshot is not None and self._snapshot.fresh:
+            for name in table_names:
+                cache_name, entity = self.find_table(name, schema)
+                if entity is not None:
+                    return cache_name, entity
+
+        candidates = []
+        if schema:
+            candidates.append(schema)
+        candidates.append("SQL_" + (schema or "PUBLIC").upper() + "_" + table_name.upper())
+
+        for cache_name in candidates:
+            entities = self._cache_entities_or_none(cache_name) or []
+            for name in table_names:
+                for entity in entities:
+                    if entity.get("table_name") == name:
+                        return cache_name, entity
+
+        from pyignite.exceptions import SQLError
+
+        query = "SELECT CACHE_NAME, TABLE_NAME FROM SYS.TABLES WHERE TABLE_NAME IN (" + \
+                ", ".join("?" for _ in table_names) + ")"
+        args = list(table_names)
+        if schema:
+            query += " AND (SCHEMA_NAME = ? OR CACHE_NAME = ?)"
+            args += [schema.upper(), schema]
+
+        try:
+            with self.client.sql(query, query_args=args) as cursor:
+                tables = sorted(cursor, key=lambda row: table_names.index(row[1]))
+
+        except SQLError as e:
+            logger.debug("System view SYS.TABLES is not available: %s", e)
+            for name in table_names:
+                cache_name, entity = self.find_table(name, schema)
+                if entity is not None:
+                    return cache_name, entity
+            return None, None
+
+        for cache_name, name in tables:
+            entity = self._entity_from_cache(name, cache_name)
+            if entity is not None:
+                return cache_name, entity
+
+        return None, None
+
+    def has_schema(self, schema):
+        """
+        Check whether a schema exists; in Apache Ignite, schemas
+        refer to cache names or to the SQL schema of caches that
+        are named SQL_<SCHEMA>_<TABLE>
+        """
+        prefix = "SQL_" + schema.upper() + "_"
+
+        def exists(cache_names):
+            return schema in cache_names or any(cache_name.startswith(prefix) for cache_name in cache_names)
 
-        return columns
+        if exists(self._cache_names()):
+            return True
+        """A schema that is missing in the snapshot may have been created after startup"""
+        if self._snapshot is not None and self._snapshot.fresh:
+            return exists(self.client.get_cache_names())
+
+        return False
+
+    def has_table(self, table_name, schema=None):
+        """
+        Check whether a table exists
+        """
+        return self._locate_table(table_name, schema)[1] is not None
+
+    def has_index(self, table_name, index_name, schema=None):
+        """
+        Check whether an index of a certain table exists
+        """
+        _, entity = self._locate_table(table_name, schema)
+        if entity is None:
+            return False
+
+        names = {index.get("index_name") for index in entity.get("query_indexes") or []}
+        return index_name in names or index_name.upper() in names
+
+    def get_table_stats(self, table_name, schema=None):
+        """
+        Estimate the size of a table from the entry counts of its
+        cache (per peek mode) and the partition distribution of the
+        cache, without scanning the table:
+
+        {
+            'cache_name':           <cache name>,
+            'rows':                 <primary entries>,
+            'backup_rows':          <backup entries>,
+            'onheap_rows':          <on-heap entries>,
+            'offheap_rows':         <off-heap entries>,
+            'partitions':           <number of partitions>,
+            'rows_per_partition':   <estimated rows per partition>,
+            'partitions_per_node':  {<node>: <number of primary partitions>},
+        }
+
+        The statistics are cached for a short time (see `stats_ttl`).
+        """
+        key = (schema, table_name)
+
+        cached = self._stats.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        cache_name, entity = self._locate_table(table_name, schema)
+        if entity is None:
+            raise ProgrammingError("Table " + table_name + " does not exist.")
+
+        from pyignite.api.affinity import cache_get_node_partitions
+        from pyignite.datatypes.key_value import PeekModes
+        from pyignite.utils import cache_id
+
+        cache = self.client.get_cache(cache_name)
+        stats = {
+            'cache_name': cache_name,
+            'rows': cache.get_size(PeekModes.PRIMARY),
+            'backup_rows': cache.get_size(PeekModes.BACKUP),
+            'onheap_rows': cache.get_size(PeekModes.ONHEAP),
+            'offheap_rows': cache.get_size(PeekModes.OFFHEAP),
+            'partitions': 0,
+            'rows_per_partition': None,
+            'partitions_per_node': {},
+        }
+        """
+        The partition distribution is available for partitioned
+        caches only
+        """
+        result = cache_get_node_partitions(self.client.random_node, cache_id(cache_name))
+        if result.status == 0:
+            mapping = result.value['partition_mapping'].get(cache_id(cache_name), {})
+            if mapping.get('is_applicable'):
+                nodes = {node.uuid: '{0}:{1}'.format(node.host, node.port)
+                         for node in self.client._nodes if node.uuid}
+
+                partitions = mapping.get('number_of_partitions', 0)
+                stats['partitions'] = partitions
+                if partitions:
+                    stats['rows_per_partition'] = stats['rows'] / partitions
+
+                stats['partitions_per_node'] = {
+                    nodes.get(node_uuid, str(node_uuid)): len(node_partitions)
+                    for node_uuid, node_partitions in mapping.get('node_mapping', {}).items()
+                }
+
+        self._stats[key] = (time.monotonic() + self._stats_ttl, stats)
+        return stats
+
+    def get_columns(self, table_name, schema=None):
+        """
+        Retrieve the cache configuration that refers to
+        the provided table_name (and schema)
+        """
+        _, entity = self.find_table(table_name, schema)
+        if entity is None:
+            return []
+
+        return _columns_from_entity(entity)
+
+    def subscribe(self, table_name, version_column=None, filter=None, schema=None,
+                  interval=1.0, buffer_size=1024, page_size=1024, initial=False,
+                  max_rows=1000000):
+        """
+        Subscribe to the changes of an Apache Ignite table. The
+        returned Subscription yields row events as a (blocking)
+        iterator or an async iterator.
+
+        The changes are detected by polling a change indicator
+        every `interval` seconds; this requires a version column
+        that is increased with each write of a row (see the
+        subscription module). Without continuous queries in the
+        thin client, tables without such a column are not supported.
+
+        The optional filter is a callable that receives a row as
+        a dictionary of column names and values; only rows that
+        pass the filter are reported.
+        """
+        if not version_column:
+            raise NotSupportedError("Subscriptions require a version column.")
+
+        cache_name, entity = self.find_table(table_name, schema)
+        if entity is None:
+            raise ProgrammingError("Table " + table_name + " does not exist.")
+
+        return Subscription(self._connect(),
+                            cache_name,
+                            entity.get("table_name") or table_name,
+                            _columns_from_entity(entity),
+                            version_column,
+                            schema=schema,
+                            filter=filter,
+                            interval=interval,
+                            buffer_size=buffer_size,
+                            page_size=page_size,
+                            initial=initial,
+                            max_rows=max_rows)
 
     def get_schema_names(self):
         """
@@ -409,7 +1339,7 @@ class IgniteContext(object):
         the cache names refer to the respective schema
         """
 
-        return self.client.get_cache_names()
+        return self._cache_names()
 
     def get_table_names(self, schema=None):
         """
@@ -418,7 +1348,7 @@ class IgniteContext(object):
         refers to a SQL table
         """
         tables = []
-        cache_names = self.client.get_cache_names()
+        cache_names = self._cache_names()
         """
         Check whether the schema (name) is one of the extracted
         cache names
@@ -430,9 +1360,8 @@ class IgniteContext(object):
                 Retrieve the respective cache settings and extract
                 the associated table name
                 """
-                cfg = self.client.get_cache(schema).settings
-                if 200 in cfg:
-                    entities = cfg.get(200)
+                entities = self._cache_entities(schema)
+                if entities is not None:
                     for entity in entities:
                         table_name = entity.get("table_name")
                         tables.append(table_name)
@@ -473,9 +1402,8 @@ class IgniteContext(object):
                 }
             ]
             """
-            cfg = self.client.get_cache(cache_name).settings
-            if 200 in cfg:
-                entities = cfg.get(200)
+            entities = self._cache_entities(cache_name)
+            if entities is not None:
                 for entity in entities:
                     table_name = entity.get("table_name")
                     tables.append(table_name)
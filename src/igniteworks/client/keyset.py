@@ -0,0 +1,161 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import re
+
+from igniteworks.client.exceptions import OperationalError
+
+"""
+Key-set DML: DELETE and UPDATE statements whose only predicate is
+an IN list on the (single-column) key of a table, e.g.
+
+DELETE FROM <table> WHERE <key> IN (<values>)
+UPDATE <table> SET <assignments> WHERE <key> IN (<values>)
+
+Large IN lists are slow to parse and are planned as distributed
+queries. Instead, the keys are grouped by their primary node:
+deletes are sent as `remove_keys` batches, and updates as chunked
+statements that are executed by the node that owns their keys.
+"""
+
+_KEYSET_DELETE = re.compile(
+    r"^\s*DELETE\s+FROM\s+(?:\"?(\w+)\"?\.)?\"?(\w+)\"?\s+"
+    r"WHERE\s+(?:\w+\.)?\"?(\w+)\"?\s+IN\s*\(([^()]*)\)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+
+_KEYSET_UPDATE = re.compile(
+    r"^\s*(UPDATE\s+(?:\"?(\w+)\"?\.)?\"?(\w+)\"?\s+SET\s+.*?)\s+"
+    r"WHERE\s+(?:\w+\.)?\"?(\w+)\"?\s+IN\s*\(([^()]*)\)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+
+"""Assignments with sub-queries or further predicates are not supported"""
+_COMPLEX = re.compile(r"\b(?:SELECT|WHERE)\b", re.IGNORECASE)
+
+_VALUE = re.compile(r"\s*(\?|'(?:[^']|'')*'|-?\d+(?:\.\d+)?)\s*(,|$)")
+
+
+def _placeholders(text):
+    """
+    The number of `?` placeholders of a text, ignoring string
+    literals
+    """
+    return len(re.findall(r"\?", re.sub(r"'(?:[^']|'')*'", "", text)))
+
+
+def _values(text, args, offset):
+    """
+    Parse the values of an IN list; placeholders refer to the
+    arguments starting at the provided offset. None is returned
+    if the list contains anything else than values
+    """
+    values = []
+    position = 0
+    index = offset
+    while position < len(text):
+        match = _VALUE.match(text, position)
+        if not match:
+            return None
+
+        token = match.group(1)
+        if token == "?":
+            if args is None or index >= len(args):
+                return None
+            values.append(args[index])
+            index += 1
+        elif token.startswith("'"):
+            values.append(token[1:-1].replace("''", "'"))
+        else:
+            values.append(float(token) if "." in token else int(token))
+
+        position = match.end()
+        if not match.group(2):
+            break
+
+    if position < len(text) or args is not None and index != len(args):
+        return None
+
+    return values
+
+
+def parse_keyset(stmt, args):
+    """
+    Transform a key-set DELETE or UPDATE statement into (head,
+    head arguments, schema, table, key column, key values); head
+    is None for a DELETE and the statement up to its WHERE clause
+    for an UPDATE. None is returned for all other statements
+    """
+    match = _KEYSET_DELETE.match(stmt)
+    if match:
+        values = _values(match.group(4), args, 0)
+        if values is None:
+            return None
+
+        return None, [], match.group(1), match.group(2), match.group(3), values
+
+    match = _KEYSET_UPDATE.match(stmt)
+    if match:
+        head = match.group(1)
+        if _COMPLEX.search(head, len("UPDATE")):
+            return None
+
+        count = _placeholders(head)
+        values = _values(match.group(5), args, count)
+        if values is None:
+            return None
+
+        return head, list(args[:count]) if count else [], \
+            match.group(2), match.group(3), match.group(4), values
+
+    return None
+
+
+def group_keys(client, cache_name, hint, keys):
+    """
+    Group keys by their primary node (connection)
+    """
+    groups = {}
+    for key in keys:
+        node = client.get_best_node(cache_name, key, hint)
+        groups.setdefault(node, []).append(key)
+
+    return groups
+
+
+def remove_keys(client, cache_name, hint, keys, batch_size=1000):
+    """
+    Remove keys from a cache in `remove_keys` batches that are
+    sent to the primary node of the keys; returns the number of
+    keys that were sent
+    """
+    from pyignite.api.key_value import cache_remove_keys
+    from pyignite.queries.cache_info import CacheInfo
+    from pyignite.utils import cache_id
+
+    cache_info = CacheInfo(cache_id=cache_id(cache_name), protocol_context=client.protocol_context)
+
+    count = 0
+    for node, node_keys in group_keys(client, cache_name, hint, keys).items():
+        for i in range(0, len(node_keys), batch_size):
+            batch = [(key, hint) for key in node_keys[i:i + batch_size]]
+
+            result = cache_remove_keys(node, cache_info, batch)
+            if result.status != 0:
+                raise OperationalError(result.message)
+
+            count += len(batch)
+
+    return count
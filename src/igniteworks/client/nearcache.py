@@ -0,0 +1,356 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import logging
+import re
+import threading
+
+from igniteworks.client.digest import row_digest
+from igniteworks.client.exceptions import ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+"""
+A near cache keeps the complete content of a small REPLICATED
+table (e.g. country codes or currencies) in local memory, and
+answers simple equality SELECTs on this table without any
+network round trip:
+
+SELECT <columns> | * FROM [<schema>.]<table> [[AS] <alias>]
+    [WHERE <column> = <value> [AND <column> = <value> ...]]
+
+This covers the lookups of SQLAlchemy's `session.get`. All other
+statements are sent to the cluster.
+
+A near cache is shared by all connections of a process. It is
+loaded when the first connection is opened, and a background
+thread reloads it periodically (version check), or immediately
+after a write to the table through this process.
+
+Writes increment the generation of the near cache; it answers
+SELECTs only if it has been loaded after the latest write, i.e.
+a load that started before the write completed does not count.
+"""
+
+_SELECT = re.compile(
+    r"^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+(?:\"?(?P<schema>\w+)\"?\.)?\"?(?P<table>\w+)\"?"
+    r"(?:\s+(?:AS\s+)?(?!WHERE\b)(?P<alias>\w+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+
+_COLUMN = re.compile(r"^(?:\w+\.)?(?:(\w+)|\"(\w+)\")(?:\s+(?:AS\s+)?(?:(\w+)|\"(\w+)\"))?$", re.IGNORECASE)
+_PREDICATE = re.compile(r"^(?:\w+\.)?\"?(\w+)\"?\s*=\s*(\?|'(?:[^']|'')*'|-?\d+(?:\.\d+)?)$", re.IGNORECASE)
+_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_NOT_SIMPLE = re.compile(r"\b(?:JOIN|OR|UNION|ORDER|GROUP|HAVING|LIMIT|OFFSET|DISTINCT)\b|[()]", re.IGNORECASE)
+
+_near_caches = {}
+_near_caches_lock = threading.Lock()
+
+
+def _literal(token, args, index):
+
+    if token == "?":
+        return args[index]
+
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+
+    return float(token) if "." in token else int(token)
+
+
+def parse_select(stmt, args):
+    """
+    Decompose a simple equality SELECT into (schema, table,
+    columns, predicates), or return None if the statement is
+    not supported by near caches; columns are (column name,
+    result name) pairs or None for `*`, and predicates are
+    (column name, value) pairs
+    """
+    if _NOT_SIMPLE.search(stmt):
+        return None
+
+    match = _SELECT.match(stmt)
+    if not match:
+        return None
+
+    columns = None
+    if match.group("columns").strip() != "*":
+        columns = []
+        for column in match.group("columns").split(","):
+            parsed = _COLUMN.match(column.strip())
+            if not parsed:
+                return None
+            name = parsed.group(1).upper() if parsed.group(1) else parsed.group(2)
+            if parsed.group(3):
+                label = parsed.group(3).upper()
+            else:
+                label = parsed.group(4) or name
+            columns.append((name, label))
+
+    predicates = []
+    if match.group("where"):
+        index = 0
+        for condition in _AND.split(match.group("where").strip()):
+            parsed = _PREDICATE.match(condition.strip())
+            if not parsed:
+                return None
+            try:
+                value = _literal(parsed.group(2), args, index)
+            except (IndexError, TypeError):
+                return None
+            if parsed.group(2) == "?":
+                index += 1
+            predicates.append((parsed.group(1).upper(), value))
+
+        if index != len(args or []):
+            return None
+
+    elif args:
+        return None
+
+    schema = match.group("schema").upper() if match.group("schema") else None
+    return schema, match.group("table").upper(), columns, predicates
+
+
+class NearCache(object):
+    """
+    Local, indexed copy of a REPLICATED Apache Ignite table
+    """
+
+    def __init__(self,
+                 schema,
+                 table_name,
+                 # callable that provides a dedicated Ignite client
+                 connect,
+                 # (optional) seconds between two version checks
+                 ttl=60.0):
+
+        self.schema = schema
+        self.table_name = table_name
+
+        self._connect = connect
+        self._ttl = ttl
+
+        self._columns = None
+        self._rows = None
+        self._digest = None
+        """Column name -> {value: [row, ...]}, built on first use"""
+        self._indexes = {}
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        """
+        The generation is incremented by each invalidation; the
+        loaded generation is the generation at the start of the
+        latest load
+        """
+        self._generation = 0
+        self._loaded_generation = 0
+
+        self._thread = None
+
+    @classmethod
+    def open(cls, nodes, schema, table_name, connect, ttl=60.0):
+        """
+        Return the (shared) near cache of a certain table of the
+        cluster that is defined by the provided nodes
+        """
+        key = (tuple(sorted(tuple(node) for node in nodes)), schema, table_name)
+        with _near_caches_lock:
+            near_cache = _near_caches.get(key)
+            if near_cache is None:
+                near_cache = cls(schema, table_name, connect, ttl)
+                _near_caches[key] = near_cache
+
+        return near_cache
+
+    @property
+    def loaded(self):
+        return self._rows is not None
+
+    def load(self, client):
+        """
+        Load the complete table; the content (and its indexes)
+        is replaced only if the table has changed
+        """
+        with self._lock:
+            generation = self._generation
+
+        result = client.sql("SELECT * FROM " + self.schema + "." + self.table_name,
+                            page_size=4096, include_field_names=True)
+
+        columns = [str(name).upper() for name in next(result)]
+        rows = [tuple(row) for row in result]
+        digest = row_digest(rows)
+
+        with self._lock:
+            changed = digest != self._digest or columns != self._columns
+            if changed:
+                self._columns = columns
+                self._rows = rows
+                self._digest = digest
+                self._indexes = {}
+
+            self._loaded_generation = max(self._loaded_generation, generation)
+
+        if changed:
+            logger.debug("Near cache %s.%s loaded: %d rows", self.schema, self.table_name, len(rows))
+
+        return changed
+
+    def start(self):
+        """
+        Start the background thread that keeps the near cache
+        up to date (once per near cache)
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = threading.Thread(target=self._run,
+                                            name="igniteworks-near-cache",
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+
+        client = None
+        while True:
+            with self._changed:
+                self._changed.wait_for(self._stale, self._ttl)
+            try:
+                if client is None:
+                    client = self._connect()
+                self.load(client)
+
+            except Exception as e:
+                logger.warning("Near cache %s.%s cannot be refreshed: %s", self.schema, self.table_name, e)
+                if client is not None:
+                    try:
+                        client.close()
+                    except Exception:
+                        pass
+                client = None
+
+    def _stale(self):
+        return self._loaded_generation != self._generation
+
+    def invalidate(self):
+        """
+        Bypass the near cache until it has been reloaded; this
+        is called after a write to the table
+        """
+        with self._changed:
+            self._generation += 1
+            self._changed.notify()
+
+    def _index(self, column):
+
+        index = self._indexes.get(column)
+        if index is None:
+            position = self._columns.index(column)
+            index = {}
+            for row in self._rows:
+                index.setdefault(row[position], []).append(row)
+            self._indexes[column] = index
+
+        return index
+
+    def select(self, columns, predicates):
+        """
+        Answer a parsed SELECT from the near cache; None is
+        returned if the near cache cannot answer it
+        """
+        with self._lock:
+            if self._rows is None or self._stale():
+                return None
+
+            names = [name for name, _ in columns] if columns is not None else self._columns
+            if any(name not in self._columns for name in names) or \
+                    any(name not in self._columns for name, _ in predicates):
+                return None
+
+            rows = self._rows
+            try:
+                for name, value in predicates:
+                    if value is None:
+                        """`= NULL` matches no row"""
+                        rows = []
+                        break
+
+                    index = self._index(name)
+                    matches = index.get(value, [])
+                    """
+                    Values of another type than the column values are
+                    converted by the cluster, not by the near cache
+                    """
+                    if not matches and \
+                            any(not isinstance(value, type(key)) for key in index if key is not None):
+                        return None
+
+                    if rows is self._rows:
+                        rows = matches
+                    else:
+                        selected = set(map(id, matches))
+                        rows = [row for row in rows if id(row) in selected]
+
+            except TypeError:
+                """Unhashable values are not indexed"""
+                return None
+
+            positions = [self._columns.index(name) for name in names]
+
+        return {
+            'cols': [label for _, label in columns] if columns is not None else list(self._columns),
+            'rows': [tuple(row[position] for position in positions) for row in rows],
+        }
+
+    def __repr__(self):
+        return '<NearCache {0}.{1}>'.format(self.schema, self.table_name)
+
+
+def open_near_caches(client, find_table, nodes, tables, connect, ttl=60.0):
+    """
+    Open the near caches of the provided tables ([<schema>.]<table>)
+    and load those that are not loaded yet; only REPLICATED tables
+    are supported
+    """
+    from pyignite.datatypes.cache_config import CacheMode
+    from pyignite.datatypes.prop_codes import PROP_CACHE_MODE
+
+    near_caches = {}
+    for table in tables:
+        schema, _, table_name = table.upper().rpartition(".")
+        schema = schema or "PUBLIC"
+
+        cache_name, entity = find_table(table_name, schema)
+        if entity is None:
+            raise ProgrammingError("Table " + table + " does not exist.")
+
+        settings = client.get_cache(cache_name).settings or {}
+        if settings.get(PROP_CACHE_MODE) != CacheMode.REPLICATED:
+            raise ProgrammingError("Near caches require a REPLICATED table: " + table)
+
+        near_cache = NearCache.open(nodes, schema, table_name, connect, ttl)
+        if not near_cache.loaded:
+            near_cache.load(client)
+        near_cache.start()
+
+        near_caches[(schema, table_name)] = near_cache
+
+    return near_caches
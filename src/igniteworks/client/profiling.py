@@ -0,0 +1,261 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import json
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("igniteworks.profile")
+
+"""
+Opt-in profiling of the statement pipeline: each stage of a
+statement is timed with a high-resolution counter and, optionally,
+its memory allocations are traced with `tracemalloc`:
+
+    clean_stmt  normalization of the statement
+    bind        binding of the DB-API parameters
+    route       selection of the target node
+    request     socket round trip and decoding of the first page
+    rows        fetching and decoding of the remaining pages and
+                building of the row tuples
+    remove_keys key removals of key-set DELETE statements
+    fetch       copying of rows by the cursor's fetch methods; with
+                `page_cache`, the pages after the first are fetched
+                and decoded on access, i.e. they are booked here and
+                not as `rows`
+    consumer    remaining time until the result is released, e.g.
+                the SQLAlchemy result processing
+
+Profiling is enabled by the IGNITEWORKS_PROFILE environment
+variable, the `profile` connection parameter or the `ignite_profile`
+execution option. The target is a file path or True (the records
+are logged to the `igniteworks.profile` logger). A file with the
+suffix `.folded` receives collapsed stacks that can be rendered as
+flame graph; all other files receive one JSON document per line.
+"""
+
+PROFILE_ENV = "IGNITEWORKS_PROFILE"
+PROFILE_MEMORY_ENV = "IGNITEWORKS_PROFILE_MEMORY"
+
+_local = threading.local()
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def _enabled(value):
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(value)
+
+
+def profile_target(option=None):
+    """
+    Resolve the profile target of an option, falling back to the
+    environment; None is returned if profiling is disabled
+    """
+    if option is None:
+        option = os.environ.get(PROFILE_ENV)
+
+    if not _enabled(option):
+        return None
+
+    if isinstance(option, str) and option.strip().lower() not in ("1", "true", "yes", "on"):
+        return option
+
+    return True
+
+
+def trace_memory(option=None):
+    """
+    Check whether allocations are traced, falling back to the
+    environment
+    """
+    if option is None:
+        option = os.environ.get(PROFILE_MEMORY_ENV)
+
+    return _enabled(option)
+
+
+class Profile(object):
+    """
+    Stage timings (and allocations) of a single statement
+    """
+
+    def __init__(self, sql, target, memory=False):
+
+        self.sql = sql
+        self.target = target
+        self.memory = memory
+
+        """stage -> [seconds, calls, allocated bytes, peak bytes]"""
+        self.stages = {}
+
+        self._start = time.perf_counter()
+        self._done = False
+
+        if memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+
+        if self.memory:
+            import tracemalloc
+            """Python 3.8 has no per-stage peak; the peak is then process-wide"""
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+
+            entry = self.stages.setdefault(name, [0.0, 0, 0, 0])
+            entry[0] += duration
+            entry[1] += 1
+
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                entry[2] += current - memory_start
+                entry[3] = max(entry[3], peak - memory_start)
+
+    @contextmanager
+    def active(self):
+        """
+        Make this profile the current profile of the thread, so
+        that the stages of the Ignite context are recorded
+        """
+        previous = getattr(_local, "profile", None)
+        _local.profile = self
+        try:
+            yield self
+        finally:
+            _local.profile = previous
+
+    def record(self):
+        """
+        Return the breakdown of the statement as dictionary; the
+        time not covered by any stage is the consumer time
+        """
+        total = time.perf_counter() - self._start
+        covered = sum(entry[0] for entry in self.stages.values())
+
+        stages = {}
+        for name, (duration, calls, allocated, peak) in self.stages.items():
+            stage = {
+                'ms': round(duration * 1000, 3),
+                'calls': calls,
+            }
+            if self.memory:
+                stage['alloc_kb'] = round(allocated / 1024, 1)
+                stage['peak_kb'] = round(peak / 1024, 1)
+            stages[name] = stage
+
+        stages['consumer'] = {
+            'ms': round(max(0.0, total - covered) * 1000, 3),
+            'calls': 1,
+        }
+
+        return {
+            'sql': self.sql,
+            'total_ms': round(total * 1000, 3),
+            'stages': stages,
+        }
+
+    def finish(self):
+        """
+        Write the record of the statement (once)
+        """
+        if self._done:
+            return
+
+        self._done = True
+        try:
+            profile_writer(self.target).write(self.record())
+
+        except Exception as e:
+            logger.debug("Profile cannot be written: %s", e)
+
+
+class ProfileWriter(object):
+    """
+    Process-wide writer of the profile records of a target
+    """
+
+    def __init__(self, target):
+
+        self.target = target
+        self._lock = threading.Lock()
+
+    def write(self, record):
+
+        if self.target is True:
+            logger.info(json.dumps(record, default=str))
+            return
+
+        if self.target.endswith(".folded"):
+            """
+            Collapsed stacks: <frame>;<frame>;... <microseconds>
+            """
+            verb = record['sql'].split(None, 1)[0].upper() if record['sql'].strip() else "SQL"
+            lines = ["igniteworks;{0};{1} {2}\n".format(verb, name, int(stage['ms'] * 1000))
+                     for name, stage in record['stages'].items()]
+        else:
+            lines = [json.dumps(record, default=str) + "\n"]
+
+        with self._lock:
+            with open(self.target, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    def __repr__(self):
+        return '<ProfileWriter {0}>'.format(self.target)
+
+
+def profile_writer(target):
+    """
+    Return the (shared) writer of a certain target
+    """
+    with _writers_lock:
+        writer = _writers.get(target)
+        if writer is None:
+            writer = ProfileWriter(target)
+            _writers[target] = writer
+
+    return writer
+
+
+def stage(name):
+    """
+    Record a stage with the current profile of the thread; this
+    is a no-op if no statement is profiled
+    """
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        return nullcontext()
+
+    return profile.stage(name)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+"""
+Binary type metadata (the classes of the Complex object types and
+schemas) shared by all Ignite Thin clients of a process that
+connect to the same cluster.
+
+Each pyignite client keeps a registry {type id: {schema id: class}}
+that is filled with extra round trips when a Complex object type is
+decoded or written for the first time. All clients of a cluster use
+the same registry instead, so that a new client (e.g. of a short-lived
+pooled connection) decodes and writes without these round trips.
+"""
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+class BinaryTypeRegistry(dict):
+    """
+    Process-wide registry of the binary types of an Apache Ignite
+    cluster; it replaces the registry of each pyignite client
+    """
+
+    def __init__(self):
+        super(BinaryTypeRegistry, self).__init__()
+        """The type names that have been pre-warmed (or tried)"""
+        self._warmed = set()
+        self._lock = threading.Lock()
+
+    def __missing__(self, type_id):
+        """
+        The registry of a client is a defaultdict(dict); setdefault
+        is atomic, so that concurrent clients share the schemas
+        of a new type
+        """
+        return self.setdefault(type_id, {})
+
+    def attach(self, client):
+        """
+        Replace the registry of a pyignite client by this registry
+        """
+        client._registry = self
+        return client
+
+    def warm(self, client, type_names):
+        """
+        Retrieve the binary types with the provided names from the
+        cluster, unless they have been retrieved before
+        """
+        with self._lock:
+            type_names = [type_name for type_name in type_names
+                          if type_name and type_name not in self._warmed]
+            self._warmed.update(type_names)
+
+        for type_name in type_names:
+            try:
+                client.query_binary_type(type_name)
+
+            except Exception as e:
+                logger.debug("Binary type %s cannot be retrieved: %s", type_name, e)
+
+    def invalidate(self):
+        """
+        Discard all binary types, e.g. after a schema change
+        """
+        with self._lock:
+            self._warmed.clear()
+            self.clear()
+
+    def __repr__(self):
+        return '<BinaryTypeRegistry types={0}>'.format(len(self))
+
+
+def binary_type_registry(nodes):
+    """
+    Return the (shared) binary type registry of the cluster that
+    is defined by the provided nodes
+    """
+    key = tuple(sorted(tuple(node) for node in nodes))
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = BinaryTypeRegistry()
+            _registries[key] = registry
+
+    return registry
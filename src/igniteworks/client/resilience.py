@@ -0,0 +1,301 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import errno
+import logging
+import random
+import re
+import socket
+import threading
+import time
+
+from igniteworks.client.exceptions import CircuitOpenError, Error, IgniteConnectionError, IntegrityError, \
+    OperationalError, ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+"""
+Failure handling of the requests to an Apache Ignite cluster:
+
+* errors of the Ignite Thin client are translated into the
+  DB-API exceptions of this package,
+
+* read-only statements and metadata requests are retried after
+  a connection failure with a jittered exponential backoff,
+
+* a circuit breaker (shared by all connections to the same
+  cluster) rejects requests immediately after a series of
+  connection failures, and lets a single trial request pass
+  when the reset timeout has expired.
+"""
+
+_READ_ONLY = re.compile(r"^\s*(?:SELECT|WITH|EXPLAIN|SHOW|GET|HAS)\b", re.IGNORECASE)
+_INTEGRITY = re.compile(r"duplicate key|constraint|null value not allowed", re.IGNORECASE)
+_SCHEMA_CHANGE = re.compile(r"binary (?:type|schema|object)|different (?:field )?types?|"
+                            r"wrong value has been set|failed to (?:un)?marshal", re.IGNORECASE)
+
+"""
+Error numbers of a socket that has been disconnected or cannot
+reach its peer; other OS errors (e.g. a full disk) are local
+"""
+_SOCKET_ERRNOS = {getattr(errno, name) for name in (
+    "ECONNRESET", "ECONNREFUSED", "ECONNABORTED", "EPIPE", "ETIMEDOUT", "ENOTCONN", "ESHUTDOWN",
+    "EHOSTUNREACH", "EHOSTDOWN", "ENETUNREACH", "ENETDOWN", "ENETRESET") if hasattr(errno, name)}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def is_read_only(stmt):
+    """
+    Check whether a statement can be retried safely, i.e. it
+    is a query or a metadata request
+    """
+    return bool(stmt) and _READ_ONLY.match(stmt) is not None
+
+
+def is_connection_error(error):
+    """
+    Check whether an error of the Ignite Thin client indicates
+    a broken or unavailable connection. pyignite treats every
+    OSError as connection error; here, an OSError only counts if
+    it is a socket error, or if pyignite raised it without error
+    number (e.g. "Connection broken.")
+    """
+    from pyignite.exceptions import ReconnectError
+    if isinstance(error, (ReconnectError, ConnectionError, EOFError, socket.timeout,
+                          socket.gaierror, socket.herror)):
+        return True
+
+    if not isinstance(error, OSError):
+        return False
+
+    if error.errno is not None:
+        return error.errno in _SOCKET_ERRNOS
+
+    return _raised_by(error, "pyignite")
+
+
+def _raised_by(error, package):
+    """
+    Check whether an error has been raised by a module of a
+    certain package
+    """
+    traceback = error.__traceback__
+    if traceback is None:
+        return False
+
+    while traceback.tb_next is not None:
+        traceback = traceback.tb_next
+
+    module = traceback.tb_frame.f_globals.get("__name__", "")
+    return module == package or module.startswith(package + ".")
+
+
+def is_server_error(error):
+    """
+    Check whether an error has been reported by the cluster, i.e.
+    the request has reached a node
+    """
+    from pyignite import exceptions
+    return isinstance(error, (exceptions.SQLError, exceptions.CacheError, exceptions.ClusterError,
+                              exceptions.AuthenticationError))
+
+
+def is_schema_error(error):
+    """
+    Check whether an error of the Ignite Thin client indicates
+    outdated binary type metadata, e.g. after a schema change
+    """
+    from pyignite.exceptions import BinaryTypeError
+    if isinstance(error, BinaryTypeError):
+        return True
+
+    message = getattr(error, "message", None) or str(error)
+    return _SCHEMA_CHANGE.search(message) is not None
+
+
+def translate_error(error):
+    """
+    Translate an error of the Ignite Thin client into the
+    respective DB-API exception
+    """
+    if isinstance(error, Error):
+        return error
+
+    from pyignite import exceptions
+
+    message = getattr(error, "message", None) or str(error)
+    if is_connection_error(error) or isinstance(error, exceptions.HandshakeError):
+        return IgniteConnectionError(message)
+
+    if isinstance(error, exceptions.AuthenticationError):
+        return OperationalError(message)
+
+    if isinstance(error, exceptions.SQLError):
+        if _INTEGRITY.search(message):
+            return IntegrityError(message)
+        return ProgrammingError(message)
+
+    if isinstance(error, (exceptions.CacheError, exceptions.ClusterError)):
+        return OperationalError(message)
+
+    if isinstance(error, (exceptions.ParameterError, exceptions.ParseError)):
+        return ProgrammingError(message)
+
+    return error
+
+
+def backoff(attempt, base=0.1, cap=5.0):
+    """
+    The delay (in seconds) before a certain retry attempt: the
+    delay is drawn uniformly from [0, min(cap, base * 2^attempt)],
+    so that clients that failed at the same time do not retry
+    at the same time
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker over the connection failures to an Apache
+    Ignite cluster
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self,
+                 # number of consecutive connection failures that open the circuit
+                 failure_threshold=5,
+                 # (optional) seconds before a trial request is let through
+                 reset_timeout=30.0):
+
+        self._threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def before(self):
+        """
+        Check whether a request may be sent; CircuitOpenError is
+        raised while the circuit is open
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+
+            if self._state == self.OPEN and \
+                    time.monotonic() - self._opened_at >= self._reset_timeout:
+                """Exactly one request tries the cluster again"""
+                self._state = self.HALF_OPEN
+                return
+
+        raise CircuitOpenError("Apache Ignite cluster is unavailable; circuit is open.")
+
+    def success(self):
+
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def inconclusive(self):
+        """
+        A request failed without proving or disproving that the
+        cluster is available (e.g. a client-side error); if it was
+        the trial request, the next request is the trial
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic() - self._reset_timeout
+
+    def failure(self):
+
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self._threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit opened after %d connection failures", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def __repr__(self):
+        return '<CircuitBreaker {0}>'.format(self._state)
+
+
+def circuit_breaker(nodes, failure_threshold=5, reset_timeout=30.0):
+    """
+    Return the (shared) circuit breaker of the cluster that is
+    defined by the provided nodes; the threshold and timeout of
+    the first connection to the cluster apply to all others
+    """
+    key = tuple(sorted(tuple(node) for node in nodes))
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(failure_threshold, reset_timeout)
+            _breakers[key] = breaker
+
+    return breaker
+
+
+class TranslatedCursor(object):
+    """
+    Query cursor wrapper that translates the errors of the Ignite
+    Thin client into DB-API exceptions; the pages of a streamed
+    result are fetched outside of `sql`
+    """
+
+    def __init__(self,
+                 # iterator over the rows of a pyignite query cursor
+                 source):
+
+        self._source = source
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._source)
+        except StopIteration:
+            raise
+        except Exception as e:
+            error = translate_error(e)
+            if error is e:
+                raise
+            raise error from e
+
+    def close(self):
+
+        if hasattr(self._source, "close"):
+            self._source.close()
+
+    def __repr__(self):
+        return '<TranslatedCursor {0!r}>'.format(self._source)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import re
+
+from igniteworks.client.exceptions import ProgrammingError
+
+"""
+Helpers to bind DB-API parameters to Ignite SQL statements and to
+route statements with key predicates to the node that owns the
+respective key partition(s).
+
+Apache Ignite prunes the partitions of a query with equality or IN
+predicates on the affinity key by itself; sending such a statement
+to the primary node of the key(s) makes that node both map and
+reduce node, i.e. the query is executed without any network hop
+between cluster nodes.
+"""
+
+_PYFORMAT = re.compile(r"%\((\w+)\)s|%s|%%")
+
+_TABLE = re.compile(r"\b(?:FROM|UPDATE)\s+(?:\"?(\w+)\"?\.)?\"?(\w+)\"?", re.IGNORECASE)
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_NOT_ROUTABLE = re.compile(r"\b(?:JOIN|OR|UNION)\b|\(\s*SELECT\b", re.IGNORECASE)
+
+_VALUE = r"(\?|'(?:[^']|'')*'|-?\d+(?:\.\d+)?)"
+
+"""Java type names and the respective pyignite type hints"""
+_TYPE_HINTS = {
+    "java.lang.Byte": "ByteObject",
+    "java.lang.Short": "ShortObject",
+    "java.lang.Integer": "IntObject",
+    "java.lang.Long": "LongObject",
+    "java.lang.Float": "FloatObject",
+    "java.lang.Double": "DoubleObject",
+    "java.lang.Boolean": "BoolObject",
+    "java.lang.Character": "CharObject",
+    "java.lang.String": "String",
+    "java.util.UUID": "UUIDObject",
+    "java.math.BigDecimal": "DecimalObject",
+    "java.sql.Date": "DateObject",
+    "java.sql.Timestamp": "TimestampObject",
+    "java.sql.Time": "TimeObject",
+    "byte[]": "ByteArrayObject",
+}
+
+"""Java types that can be used as (primitive) cache keys"""
+_KEY_TYPES = set(_TYPE_HINTS.keys()) - {"byte[]", "java.sql.Time"}
+
+
+def bind_parameters(stmt, parameters):
+    """
+    Transform a statement with `pyformat` parameters into a statement
+    with `?` placeholders and the list of query arguments
+    """
+    if parameters is None:
+        return stmt, None
+
+    args = []
+    positional = iter(parameters) if isinstance(parameters, (list, tuple)) else None
+
+    def replace(match):
+        token = match.group(0)
+        if token == "%%":
+            return "%"
+
+        if token == "%s":
+            if positional is None:
+                raise ProgrammingError("Positional parameter used with a mapping of parameters.")
+            try:
+                args.append(next(positional))
+            except StopIteration:
+                raise ProgrammingError("Not enough parameters for the SQL statement.")
+        else:
+            if positional is not None:
+                raise ProgrammingError("Named parameter used with a sequence of parameters.")
+            try:
+                args.append(parameters[match.group(1)])
+            except KeyError:
+                raise ProgrammingError("Parameter " + match.group(1) + " is not provided.")
+
+        return "?"
+
+    stmt = _PYFORMAT.sub(replace, stmt)
+    return stmt, args
+
+
+def type_hint(type_name):
+    """
+    Return the pyignite type hint of a certain Java type, or
+    None if the type is not supported
+    """
+    name = _TYPE_HINTS.get(type_name)
+    if name is None:
+        return None
+
+    from pyignite import datatypes
+    return getattr(datatypes, name)
+
+
+def key_hint(type_name):
+    """
+    Return the pyignite type hint of a certain Java key type,
+    or None if the type is not supported
+    """
+    if type_name not in _KEY_TYPES:
+        return None
+
+    return type_hint(type_name)
+
+
+def statement_table(stmt):
+    """
+    Return the (schema, table) a simple single-table statement
+    refers to, or None for statements that cannot be routed
+    """
+    if _NOT_ROUTABLE.search(stmt):
+        return None
+
+    match = _TABLE.search(stmt)
+    if not match:
+        return None
+    """Statements that refer to more than one table are not routed"""
+    where = _WHERE.search(stmt, match.end())
+    if "," in stmt[match.end():where.start() if where else len(stmt)]:
+        return None
+
+    return match.group(1), match.group(2)
+
+
+def _placeholder_index(stmt, position):
+    """
+    The number of `?` placeholders before a certain position,
+    ignoring string literals
+    """
+    count = 0
+    quoted = False
+    for char in stmt[:position]:
+        if char == "'":
+            quoted = not quoted
+        elif char == "?" and not quoted:
+            count += 1
+
+    return count
+
+
+def _value(token, stmt, position, args):
+
+    if token == "?":
+        index = _placeholder_index(stmt, position)
+        if args is None or index >= len(args):
+            raise LookupError(token)
+        return args[index]
+
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+
+    return float(token) if "." in token else int(token)
+
+
+def key_values(stmt, args, key_column):
+    """
+    Return the key values of an equality or IN predicate on the
+    provided key column of a statement, or None if the statement
+    has no such predicate
+    """
+    where = _WHERE.search(stmt)
+    if not where:
+        return None
+
+    column = r"(?<![\w.])(?:\w+\.)?\"?" + re.escape(key_column) + r"\"?(?!\w)"
+
+    equality = re.compile(column + r"\s*=\s*" + _VALUE, re.IGNORECASE)
+    match = equality.search(stmt, where.end())
+    try:
+        if match:
+            return [_value(match.group(1), stmt, match.start(1), args)]
+
+        within = re.compile(column + r"\s+IN\s*\(([^)]*)\)", re.IGNORECASE)
+        match = within.search(stmt, where.end())
+        if match:
+            values = []
+            for token in re.finditer(_VALUE, match.group(1)):
+                values.append(_value(token.group(1), stmt, match.start(1) + token.start(1), args))
+            return values if values else None
+
+    except (LookupError, ValueError):
+        return None
+
+    return None
+
+
+def sql_on_node(client, node, query_str, page_size=1024, query_args=None,
+                schema='PUBLIC', include_field_names=False):
+    """
+    Run an SQL fields query on a certain node (connection) of the
+    Ignite client instead of a random node
+    """
+    from pyignite.api.sql import sql_fields
+    from pyignite.cursors import SqlFieldsCursor
+    from pyignite.queries.cache_info import CacheInfo
+
+    cursor = SqlFieldsCursor.__new__(SqlFieldsCursor)
+    cursor.client = client
+    cursor.cache_info = CacheInfo(protocol_context=client.protocol_context)
+    cursor.connection = node
+
+    cursor._finalize_init(sql_fields(node, cursor.cache_info, query_str, page_size,
+                                     query_args=query_args,
+                                     schema=schema,
+                                     include_field_names=include_field_names))
+    return cursor
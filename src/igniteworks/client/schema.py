@@ -0,0 +1,291 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+"""
+A schema snapshot persists the query entities (tables, columns,
+keys and indexes) of all caches of an Apache Ignite cluster in a
+local JSON file:
+
+{
+    'version': 1,
+    'caches': {
+        <cache name>: {
+            'hash':     <digest of the query entities>,
+            'entities': [<query entity>, ...]
+        },
+        ...
+    }
+}
+
+A snapshot is shared by all connections of a process that refer
+to the same file. It serves the reflection requests immediately
+after startup, while a background thread revalidates it against
+the cluster and rewrites the file if the cluster has changed.
+
+The snapshot is revalidated periodically, and it is invalidated
+by DDL statements; an invalidated snapshot is not used until it
+has been revalidated. A periodic revalidation compares the cache
+names only and fetches the configurations of new caches; all
+cache configurations are compared after an invalidation and at a
+longer interval, as they are one request per cache.
+"""
+
+_VERSION = 1
+
+"""Seconds between two revalidations of a snapshot"""
+_REVALIDATE_INTERVAL = 300.0
+"""Minimum seconds between two revalidations of an invalidated snapshot"""
+_RETRY_INTERVAL = 1.0
+"""Seconds between two comparisons of all cache configurations"""
+_COMPARE_INTERVAL = 3600.0
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def _entities_hash(entities):
+    data = json.dumps(entities, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _entities_from_client(client, cache_name):
+    cfg = client.get_cache(cache_name).settings
+    return cfg.get(200) if cfg else None
+
+
+class SchemaSnapshot(object):
+    """
+    Process-wide persisted metadata of the caches of an
+    Apache Ignite cluster
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+
+        self._caches = None
+        self._lock = threading.Lock()
+        self._revalidation = None
+        """
+        The snapshot is stale after an invalidation; the generation
+        detects invalidations during a revalidation
+        """
+        self._stale = False
+        self._generation = 0
+        self._revalidated_at = None
+        self._compared_at = None
+
+        self.load()
+
+    @classmethod
+    def open(cls, path):
+        """
+        Return the (shared) snapshot that refers to the
+        provided file path
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        with _snapshots_lock:
+            snapshot = _snapshots.get(path)
+            if snapshot is None:
+                snapshot = cls(path)
+                _snapshots[path] = snapshot
+
+        return snapshot
+
+    def load(self):
+        """
+        Load the snapshot file; a missing or unreadable file
+        leaves the snapshot empty
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            if data.get("version") == _VERSION:
+                self._caches = data.get("caches", {})
+
+        except FileNotFoundError:
+            pass
+
+        except (OSError, ValueError) as e:
+            logger.warning("Schema snapshot %s cannot be loaded: %s", self.path, e)
+
+    def save(self):
+        """
+        Write the snapshot file atomically
+        """
+        with self._lock:
+            data = {
+                'version': _VERSION,
+                'caches': self._caches,
+            }
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+
+        os.replace(tmp_path, self.path)
+
+    @property
+    def loaded(self):
+        return self._caches is not None
+
+    @property
+    def fresh(self):
+        """
+        The snapshot is loaded and has not been invalidated since
+        its last revalidation
+        """
+        return self._caches is not None and not self._stale
+
+    def invalidate(self):
+        """
+        Mark the snapshot as stale, e.g. after a DDL statement; the
+        next revalidation request is not delayed
+        """
+        with self._lock:
+            self._stale = True
+            self._generation += 1
+            self._revalidated_at = None
+
+    def cache_names(self):
+        """
+        Return the cache names of the snapshot, or None if the
+        snapshot is not loaded
+        """
+        with self._lock:
+            if self._caches is None:
+                return None
+            return list(self._caches.keys())
+
+    def knows(self, cache_name):
+        """
+        Check whether the snapshot contains a certain cache
+        """
+        with self._lock:
+            return self._caches is not None and cache_name in self._caches
+
+    def entities(self, cache_name):
+        """
+        Return the query entities of a certain cache; None is
+        returned if the cache defines no query entities
+        """
+        with self._lock:
+            return self._caches[cache_name].get("entities")
+
+    def revalidate(self, client):
+        """
+        Compare the snapshot with the current cache names and
+        cache configurations of the cluster, and rewrite the
+        snapshot file if anything has changed. The configurations
+        of known caches are only fetched if the snapshot is not
+        loaded or stale, or their last comparison is older than
+        the interval
+        """
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation
+            current = dict(self._caches or {})
+            compare = self._caches is None or self._stale or self._compared_at is None or \
+                now - self._compared_at >= _COMPARE_INTERVAL
+
+        cache_names = client.get_cache_names()
+
+        caches = {}
+        for cache_name in cache_names:
+            if not compare and cache_name in current:
+                caches[cache_name] = current[cache_name]
+                continue
+
+            entities = _entities_from_client(client, cache_name)
+            caches[cache_name] = {
+                'hash': _entities_hash(entities),
+                'entities': entities,
+            }
+
+        with self._lock:
+            current = self._caches or {}
+            changed = self._caches is None or \
+                current.keys() != caches.keys() or \
+                any(current[name].get("hash") != caches[name]["hash"] for name in caches)
+
+            if changed:
+                self._caches = json.loads(json.dumps(caches, default=str))
+
+            """An invalidation during the revalidation keeps the snapshot stale"""
+            if generation == self._generation:
+                self._stale = False
+                if compare:
+                    self._compared_at = now
+
+        if changed:
+            logger.info("Schema snapshot %s updated", self.path)
+            self.save()
+
+        return changed
+
+    def revalidate_async(self, connect):
+        """
+        Revalidate the snapshot in a background thread, if it is
+        stale or its last revalidation is older than the interval;
+        `connect` provides a dedicated Ignite client
+        """
+        with self._lock:
+            if self._revalidation is not None and self._revalidation.is_alive():
+                return self._revalidation
+
+            now = time.monotonic()
+            if self._revalidated_at is not None and \
+                    now - self._revalidated_at < (_RETRY_INTERVAL if self._stale else _REVALIDATE_INTERVAL):
+                return self._revalidation
+
+            self._revalidated_at = now
+            self._revalidation = threading.Thread(target=self._revalidate_with,
+                                                  args=(connect,),
+                                                  name="igniteworks-schema",
+                                                  daemon=True)
+            self._revalidation.start()
+
+        return self._revalidation
+
+    def _revalidate_with(self, connect):
+
+        client = None
+        try:
+            client = connect()
+            self.revalidate(client)
+
+        except Exception as e:
+            logger.warning("Schema snapshot %s cannot be revalidated: %s", self.path, e)
+
+        finally:
+            if client:
+                client.close()
+
+    def __repr__(self):
+        return '<SchemaSnapshot {0}>'.format(self.path)
@@ -0,0 +1,310 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import logging
+import queue
+import threading
+
+from igniteworks.client.exceptions import NotSupportedError
+
+logger = logging.getLogger(__name__)
+
+"""
+The Python thin client of Apache Ignite does not (yet) support
+continuous queries. A subscription is therefore a polling change
+stream over a table with a version column, i.e. a column that is
+increased with each write (e.g. a modification timestamp or a
+counter), which should be indexed:
+
+* each poll reads a cheap change indicator, the cache size and
+  the maximum version of the table,
+
+* if the maximum version has changed, only the rows with a
+  version at or above the previous maximum are read, and are
+  reported as inserts or updates,
+
+* if the cache size differs from the number of tracked rows,
+  the key columns of the table are read to detect deletes.
+
+The subscription tracks the key and version of each row; the
+number of tracked rows is bounded, and a larger table ends the
+subscription with an error. Row events are pushed into a bounded
+buffer; consumers block (or await) on this buffer, and polling
+blocks as long as the buffer is full (back-pressure).
+
+Row events are dictionaries:
+
+{
+    'type': 'insert' | 'update' | 'delete',
+    'key':  <key value or tuple of key values>,
+    'row':  {<column name>: <value>, ...} or None for deletes
+}
+"""
+
+_CLOSED = object()
+
+
+class Subscription(object):
+    """
+    Change stream over a single Apache Ignite table
+    """
+
+    def __init__(self,
+                 client,
+                 cache_name,
+                 table_name,
+                 columns,
+                 # column that is increased with each write of a row
+                 version_column,
+                 schema=None,
+                 filter=None,
+                 # (optional) seconds between two polls of the change indicator
+                 interval=1.0,
+                 # (optional) maximum number of buffered row events
+                 buffer_size=1024,
+                 # (optional) query page size
+                 page_size=1024,
+                 # (optional) report the current rows as inserts
+                 initial=False,
+                 # (optional) maximum number of tracked rows
+                 max_rows=1000000):
+
+        self.client = client
+        self.cache_name = cache_name
+        self.table_name = (schema + "." if schema else "") + table_name
+
+        """Field name -> SQL column name"""
+        self._columns = [(column.get("name"), column.get("alias") or column.get("name"))
+                         for column in columns]
+        self._key_columns = [column.get("alias") or column.get("name")
+                             for column in columns if column.get("is_key") == "true"]
+
+        sql_names = {name.upper(): sql_name for name, sql_name in self._columns}
+        if version_column.upper() not in sql_names:
+            raise NotSupportedError("Version column " + version_column + " does not exist.")
+        self._version_column = sql_names[version_column.upper()]
+
+        self._filter = filter
+        self._interval = interval
+        self._page_size = page_size
+        self._initial = initial
+        self._max_rows = max_rows
+
+        """Key -> (version, whether the row passed the filter)"""
+        self._rows = {}
+        self._version = None
+
+        self._events = queue.Queue(maxsize=buffer_size)
+        self._closed = threading.Event()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name="igniteworks-subscription",
+                                        daemon=True)
+        self._thread.start()
+
+    def _query(self, stmt, args=None):
+        """
+        Run an SQL query and yield its rows as dictionaries of
+        SQL column names and values
+        """
+        result = self.client.sql(stmt, page_size=self._page_size, query_args=args,
+                                 include_field_names=True)
+        names = [str(name).upper() for name in next(result)]
+        for values in result:
+            yield dict(zip(names, values))
+
+    def _key(self, values):
+
+        key = tuple(values.get(column.upper()) for column in self._key_columns)
+        return key[0] if len(key) == 1 else key
+
+    def _put(self, event):
+        """
+        Push an event into the buffer; this blocks while the
+        buffer is full and the subscription is not closed
+        """
+        while not self._closed.is_set():
+            try:
+                self._events.put(event, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _indicator(self):
+        """
+        The change indicator: cache size and maximum version
+        """
+        size = self.client.get_cache(self.cache_name).get_size()
+        rows = list(self._query("SELECT MAX(" + self._version_column + ") FROM " + self.table_name))
+        return size, list(rows[0].values())[0] if rows else None
+
+    def _changes(self, report):
+        """
+        Read the rows that have been written since the previous
+        maximum version
+        """
+        stmt = "SELECT " + ", ".join(sql_name for _, sql_name in self._columns) + " FROM " + self.table_name
+        args = None
+        if self._version is not None:
+            stmt += " WHERE " + self._version_column + " >= ?"
+            args = [self._version]
+
+        for values in self._query(stmt, args):
+            if self._closed.is_set():
+                return
+
+            key = self._key(values)
+            version = values.get(self._version_column.upper())
+            previous = self._rows.get(key)
+            if previous is not None and previous[0] == version:
+                continue
+
+            row = {name: values.get(sql_name.upper()) for name, sql_name in self._columns}
+            passed = not self._filter or bool(self._filter(row))
+            self._track(key, (version, passed))
+
+            if report and passed:
+                self._put({'type': 'insert' if previous is None else 'update', 'key': key, 'row': row})
+
+            if self._version is None or (version is not None and version > self._version):
+                self._version = version
+
+    def _deletes(self, report):
+        """
+        Read the keys of the table and report the tracked rows
+        that no longer exist
+        """
+        stmt = "SELECT " + ", ".join(self._key_columns) + " FROM " + self.table_name
+        keys = {self._key(values) for values in self._query(stmt)}
+
+        for key in [key for key in self._rows if key not in keys]:
+            _, passed = self._rows.pop(key)
+            if report and passed:
+                self._put({'type': 'delete', 'key': key, 'row': None})
+
+    def _track(self, key, entry):
+
+        if key not in self._rows and len(self._rows) >= self._max_rows:
+            raise NotSupportedError(
+                "Subscriptions support tables with up to " + str(self._max_rows) + " rows.")
+
+        self._rows[key] = entry
+
+    def _run(self):
+
+        indicator = None
+        report = self._initial
+
+        try:
+            while not self._closed.is_set():
+                current = self._indicator()
+                if current != indicator:
+                    if current[1] != self._version or indicator is None:
+                        self._changes(report)
+                    if current[0] != len(self._rows):
+                        self._deletes(report)
+
+                    indicator = current
+
+                report = True
+                self._closed.wait(self._interval)
+
+        except Exception as e:
+            logger.error("Subscription to table %s failed: %s", self.table_name, e)
+            self._put(e)
+
+        finally:
+            self.client.close()
+            """Unblock consumers that wait for the next event"""
+            try:
+                self._events.put_nowait(_CLOSED)
+            except queue.Full:
+                pass
+
+    def _take(self, timeout=None):
+
+        event = self._events.get(timeout=timeout)
+        if event is _CLOSED:
+            """Keep the end marker for subsequent consumers"""
+            self._events.put_nowait(_CLOSED)
+
+        elif isinstance(event, Exception):
+            raise event
+
+        return event
+
+    def get(self, timeout=None):
+        """
+        Return the next row event, or None if no event is
+        available within the provided timeout (in seconds)
+        """
+        try:
+            event = self._take(timeout)
+        except queue.Empty:
+            return None
+
+        return None if event is _CLOSED else event
+
+    def close(self):
+        """
+        Stop observing the table; buffered events are discarded
+        """
+        self._closed.set()
+
+        while True:
+            try:
+                self._events.get_nowait()
+            except queue.Empty:
+                break
+
+        self._thread.join()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        event = self._take()
+        if event is _CLOSED:
+            raise StopIteration
+
+        return event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+
+        event = await loop.run_in_executor(None, self._take)
+        if event is _CLOSED:
+            raise StopAsyncIteration
+
+        return event
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excs):
+        self.close()
+
+    def __repr__(self):
+        return '<Subscription {0}>'.format(self.cache_name)
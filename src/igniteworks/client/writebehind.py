@@ -0,0 +1,221 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import atexit
+import logging
+import threading
+
+from collections import OrderedDict
+
+from igniteworks.client.exceptions import ProgrammingError
+from igniteworks.client.writer import bulk_insert_rows
+
+logger = logging.getLogger(__name__)
+
+"""
+Write-behind buffering of INSERT and MERGE statements: the
+parameter sets of plain INSERT/MERGE ... VALUES statements are
+collected in a bounded buffer per statement (i.e. per table and
+column list), and a background thread writes them in batches
+with a dedicated Ignite client: MERGE batches are sent through
+the bulk (`put_all`) path, INSERT batches as multi-row INSERT
+statements.
+
+* a batch is written as soon as a buffer reaches the batch size,
+  or when the flush interval has expired,
+
+* a full buffer blocks the writing thread (back-pressure),
+
+* any other statement of the connection first waits until all
+  buffered rows are written, so the connection reads its own
+  writes,
+
+* closing the connection (or the interpreter) flushes the
+  buffers; write errors are reported to an error callback.
+"""
+
+
+class WriteBehind(object):
+    """
+    Write-behind buffers of a single connection
+    """
+
+    def __init__(self,
+                 # callable that provides a dedicated Ignite context
+                 connect,
+                 # (optional) number of buffered rows that triggers a flush
+                 batch_size=1000,
+                 # (optional) maximum seconds rows are buffered
+                 interval=1.0,
+                 # (optional) maximum number of buffered rows per statement
+                 capacity=10000,
+                 # (optional) callable(error, statement, parameter sets) that
+                 # is called if buffered rows cannot be written
+                 on_error=None):
+
+        self._connect = connect
+        self._context = None
+
+        self._batch_size = batch_size
+        self._interval = interval
+        self._capacity = max(capacity, batch_size)
+        self._on_error = on_error
+
+        """Statement -> buffered parameter sets"""
+        self._buffers = OrderedDict()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+
+        self._cond = threading.Condition()
+
+        self._thread = threading.Thread(target=self._run,
+                                        name="igniteworks-write-behind",
+                                        daemon=True)
+        self._thread.start()
+        """Buffered rows are written before the interpreter exits"""
+        atexit.register(self.close)
+
+    def execute(self, stmt, parameters=None, bulk_parameters=None):
+        """
+        Buffer an INSERT or MERGE statement and return its result;
+        any other statement is not buffered: all buffered rows are
+        written, and None is returned
+        """
+        seq_of_parameters = [parameters] if bulk_parameters is None else list(bulk_parameters)
+        if (parameters is None and bulk_parameters is None) or not seq_of_parameters or \
+                bulk_insert_rows(stmt, seq_of_parameters[:1]) is None:
+            self.flush()
+            return None
+
+        self._put(stmt, seq_of_parameters)
+        return {
+            'cols': [],
+            'rows': [],
+            'rowcount': len(seq_of_parameters),
+            'results': [{'rowcount': len(seq_of_parameters)}],
+        }
+
+    def _put(self, stmt, seq_of_parameters):
+
+        with self._cond:
+            position = 0
+            while position < len(seq_of_parameters):
+                buffer = self._buffers.setdefault(stmt, [])
+                """Back-pressure: wait while the buffer is full"""
+                while len(buffer) >= self._capacity and not self._closed:
+                    self._cond.notify_all()
+                    self._cond.wait()
+                    buffer = self._buffers.setdefault(stmt, [])
+
+                if self._closed:
+                    raise ProgrammingError("Connection closed")
+
+                count = self._capacity - len(buffer)
+                buffer.extend(seq_of_parameters[position:position + count])
+                position += count
+
+                if len(buffer) >= self._batch_size:
+                    self._cond.notify_all()
+
+    def _ready(self):
+        return self._closed or self._flush_requested or \
+            any(len(buffer) >= self._batch_size for buffer in self._buffers.values())
+
+    def _run(self):
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(self._ready, timeout=self._interval)
+
+                batches = [(stmt, buffer) for stmt, buffer in self._buffers.items() if buffer]
+                self._buffers = OrderedDict()
+                self._in_flight = sum(len(buffer) for _, buffer in batches)
+                self._flush_requested = False
+
+                if not batches and self._closed:
+                    self._cond.notify_all()
+                    return
+
+                """Writers blocked by full buffers may continue"""
+                self._cond.notify_all()
+
+            for stmt, buffer in batches:
+                self._write(stmt, buffer)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _write(self, stmt, seq_of_parameters):
+
+        try:
+            if self._context is None:
+                self._context = self._connect()
+
+            self._context.sql(stmt, bulk_parameters=seq_of_parameters)
+
+        except Exception as e:
+            if self._on_error is not None:
+                try:
+                    self._on_error(e, stmt, seq_of_parameters)
+                except Exception as callback_error:
+                    logger.error("Write-behind error callback failed: %s", callback_error)
+            else:
+                logger.error("Write-behind of %d rows failed: %s", len(seq_of_parameters), e)
+
+    def flush(self):
+        """
+        Write all buffered rows and wait until they are written
+        """
+        with self._cond:
+            if not self._buffers and self._in_flight == 0:
+                return
+
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: (not any(self._buffers.values()) and self._in_flight == 0)
+                                or not self._thread.is_alive())
+
+    def close(self):
+        """
+        Write all buffered rows and stop the background thread
+        """
+        atexit.unregister(self.close)
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+        self._thread.join()
+
+        if self._context is not None:
+            self._context.close()
+            self._context = None
+
+    @property
+    def pending(self):
+        """
+        The number of buffered rows that are not written yet
+        """
+        with self._cond:
+            return sum(len(buffer) for buffer in self._buffers.values()) + self._in_flight
+
+    def __repr__(self):
+        return '<WriteBehind pending={0}>'.format(self.pending)
@@ -0,0 +1,275 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import re
+
+from collections import OrderedDict
+
+from igniteworks.client.exceptions import OperationalError, ProgrammingError
+from igniteworks.client.routing import key_hint, type_hint
+
+"""
+INSERT INTO <table> (<columns>) VALUES (<parameters>) or MERGE INTO;
+all values must be parameters
+"""
+_BULK_INSERT = re.compile(
+    r"^\s*(?:INSERT|MERGE)\s+INTO\s+(?:\"?(\w+)\"?\.)?\"?(\w+)\"?\s*"
+    r"\(([^)]*)\)\s*VALUES\s*\((.*)\)\s*;?\s*$", re.IGNORECASE)
+
+_PARAMETER = re.compile(r"^%\((\w+)\)s$|^%s$")
+
+
+def bulk_insert_rows(stmt, seq_of_parameters):
+    """
+    Transform an INSERT or MERGE statement with parameter values
+    and its parameter sets into (schema, table, rows), where each
+    row is a dictionary of column names and values; None is
+    returned if the statement is not a plain bulk insert
+    """
+    match = _BULK_INSERT.match(stmt)
+    if not match:
+        return None
+
+    columns = [column.strip().strip('"').upper() for column in match.group(3).split(",")]
+    values = [value.strip() for value in match.group(4).split(",")]
+    if len(columns) != len(values):
+        return None
+
+    names = []
+    for value in values:
+        parameter = _PARAMETER.match(value)
+        if not parameter:
+            return None
+        names.append(parameter.group(1))
+
+    rows = []
+    for parameters in seq_of_parameters:
+        if isinstance(parameters, (list, tuple)):
+            rows.append(dict(zip(columns, parameters)))
+        else:
+            rows.append({column: parameters[name] for column, name in zip(columns, names)})
+
+    return match.group(1), match.group(2), rows
+
+
+def multi_row_statements(stmt, seq_of_parameters, chunk_size=1000):
+    """
+    Transform an INSERT or MERGE statement with parameter values
+    and its parameter sets into multi-row statements
+
+    INSERT INTO <table> (<columns>) VALUES (...), (...), ...
+
+    of up to `chunk_size` rows each; returns a list of (statement,
+    positional parameters), or None if the statement is not a
+    plain bulk insert
+    """
+    match = _BULK_INSERT.match(stmt)
+    if not match:
+        return None
+
+    values = [value.strip() for value in match.group(4).split(",")]
+    names = []
+    for value in values:
+        parameter = _PARAMETER.match(value)
+        if not parameter:
+            return None
+        names.append(parameter.group(1))
+
+    head = stmt[:match.start(4)].rstrip()[:-1].rstrip()
+    row = "(" + ", ".join(["%s"] * len(names)) + ")"
+
+    rows = []
+    for parameters in seq_of_parameters:
+        if isinstance(parameters, (list, tuple)):
+            rows.append(list(parameters))
+        else:
+            rows.append([parameters[name] for name in names])
+
+    statements = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        statements.append((head + " " + ", ".join([row] * len(chunk)),
+                           [value for values in chunk for value in values]))
+
+    return statements
+
+
+class BulkWriter(object):
+    """
+    Partition-aware writer for tables with a single-column
+    (primitive) key: the rows are transformed into key-value
+    pairs, grouped by the primary node of their key and sent
+    as `put_all` batches to the nodes in parallel.
+
+    Note, `put_all` overwrites existing keys, i.e. rows are
+    written with MERGE semantics; it is therefore used for MERGE
+    statements only.
+    """
+
+    def __init__(self,
+                 client,
+                 cache_name,
+                 entity,
+                 # (optional) number of rows per `put_all` request
+                 batch_size=1000,
+                 # (optional) number of nodes that are written concurrently
+                 concurrency=4):
+
+        self.client = client
+        self.cache_name = cache_name
+
+        self._batch_size = batch_size
+        self._concurrency = concurrency
+
+        query_fields = entity.get("query_fields") or []
+        """
+        The SQL column name of a field is its alias, if defined
+        """
+        aliases = {}
+        for field_name_alias in entity.get("field_name_aliases") or []:
+            aliases[field_name_alias.get("field_name")] = field_name_alias.get("alias")
+
+        key_fields = [query_field for query_field in query_fields if query_field.get("is_key_field")]
+        if len(key_fields) != 1 or key_fields[0].get("type_name") != entity.get("key_type_name"):
+            raise ProgrammingError("Bulk writes require a table with a single-column key.")
+
+        self._key_hint = key_hint(key_fields[0].get("type_name"))
+        if self._key_hint is None:
+            raise ProgrammingError("Bulk writes do not support key type " + key_fields[0].get("type_name"))
+
+        self._key_column = aliases.get(key_fields[0].get("name")) or key_fields[0].get("name")
+
+        """
+        Columns that are not provided are set to their DEFAULT
+        value, as MERGE does
+        """
+        self._value_fields = []
+        for query_field in query_fields:
+            if query_field.get("is_key_field"):
+                continue
+            name = query_field.get("name")
+            self._value_fields.append((name, aliases.get(name) or name, query_field.get("default_value")))
+
+        from pyignite import GenericObjectMeta
+        from pyignite.datatypes import AnyDataObject
+        from pyignite.queries.cache_info import CacheInfo
+        from pyignite.utils import cache_id
+
+        value_type_name = entity.get("value_type_name")
+
+        schema = OrderedDict()
+        for query_field in query_fields:
+            if not query_field.get("is_key_field"):
+                schema[query_field.get("name")] = \
+                    type_hint(query_field.get("type_name")) or AnyDataObject
+
+        self._value_class = GenericObjectMeta(value_type_name, (), {},
+                                              type_name=value_type_name,
+                                              schema=schema)
+
+        self._cache_info = CacheInfo(cache_id=cache_id(cache_name),
+                                     protocol_context=client.protocol_context)
+        """
+        pyignite registers the value class with each serialization;
+        registering it up front keeps the writer threads from
+        sending binary type requests over the shared client
+        """
+        self.client.register_binary_type(self._value_class)
+
+    def _pair(self, row):
+
+        if self._key_column not in row:
+            raise ProgrammingError("Key column " + self._key_column + " is not provided.")
+
+        value = self._value_class()
+        for name, column, default in self._value_fields:
+            setattr(value, name, row[column] if column in row else default)
+
+        return (row[self._key_column], self._key_hint), value
+
+    def _group(self, rows):
+        """
+        Group the key-value pairs by the primary node of their keys;
+        returns the groups and the number of rows
+        """
+        groups = {}
+        count = 0
+        for row in rows:
+            key, value = self._pair(row)
+            node = self.client.get_best_node(self.cache_name, key[0], key[1])
+            groups.setdefault(node, {})[key] = value
+            count += 1
+
+        return groups, count
+
+    def _put_all(self, node, pairs):
+
+        from pyignite.api.key_value import cache_put_all
+
+        result = cache_put_all(node, self._cache_info, pairs)
+        if result.status != 0:
+            raise OperationalError(result.message)
+
+        return len(pairs)
+
+    def _put_batches(self, node, pairs):
+        """
+        Send the pairs of a certain node in batches; the batches
+        of one node are sent sequentially over its connection
+        """
+        items = list(pairs.items())
+
+        count = 0
+        for i in range(0, len(items), self._batch_size):
+            count += self._put_all(node, dict(items[i:i + self._batch_size]))
+
+        return count
+
+    def write(self, rows):
+        """
+        Write the provided rows (dictionaries of column names and
+        values) and return the number of rows; rows with the same
+        key are merged, i.e. the last one is stored
+        """
+        groups, count = self._group(rows)
+        if len(groups) == 0:
+            return 0
+
+        if self._concurrency <= 1 or len(groups) == 1:
+            for node, pairs in groups.items():
+                self._put_batches(node, pairs)
+            return count
+        """
+        The value class may have been dropped from the (shared)
+        binary type registry since, e.g. after a schema change
+        """
+        self.client.register_binary_type(self._value_class)
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(self._concurrency, len(groups)),
+                                thread_name_prefix="igniteworks-writer") as executor:
+            futures = [executor.submit(self._put_batches, node, pairs) for node, pairs in groups.items()]
+            for future in futures:
+                future.result()
+
+        return count
+
+    def __repr__(self):
+        return '<BulkWriter {0}>'.format(self.cache_name)
@@ -22,13 +22,14 @@ from abc import ABC
 from sqlalchemy import types as sqltypes
 from sqlalchemy.engine import reflection
 from sqlalchemy.engine.default import DefaultDialect
+from sqlalchemy.sql.compiler import GenericTypeCompiler
 
 from igniteworks.sqlalchemy import types as ignite_types
 
 """
 The system data types are specified in form of Java data types;
-the current implementation version does not support spatial geometry 
-types from com.vividsolutions.jts library
+they are mapped onto SQL types that match the Python values that
+are decoded by pyignite, so that no result conversion is needed
 """
 TYPES_MAP = {
     # BINARY
@@ -37,14 +38,17 @@ TYPES_MAP = {
     "java.lang.Boolean": sqltypes.Boolean,
     # BYTE
     "java.lang.Byte": ignite_types.TINYINT,
+    # CHAR
+    "java.lang.Character": sqltypes.CHAR,
     # DATE: The format is yyyy-MM-dd.
     "java.sql.Date": sqltypes.DATE,
+    "java.time.LocalDate": sqltypes.DATE,
     # DOUBLE
-    "java.lang.Double": sqltypes.DECIMAL,
+    "java.lang.Double": ignite_types.DOUBLE,
     # DECIMAL
     "java.math.BigDecimal": sqltypes.DECIMAL,
     # FLOAT
-    "java.lang.Float": sqltypes.Float,
+    "java.lang.Float": ignite_types.REAL,
     # INTEGER
     "java.lang.Integer": sqltypes.Integer,
     # LONG
@@ -55,13 +59,40 @@ TYPES_MAP = {
     "java.lang.String": sqltypes.String,
     # TIME: The format is hh:mm:ss.
     "java.sql.Time": sqltypes.TIME,
+    "java.time.LocalTime": sqltypes.TIME,
     # TIMESTAMP: The format is yyyy-MM-dd hh:mm:ss[.nnnnnnnnn].
     "java.sql.Timestamp": sqltypes.TIMESTAMP,
+    "java.util.Date": sqltypes.TIMESTAMP,
+    "java.time.LocalDateTime": sqltypes.TIMESTAMP,
+    # UUID
+    "java.util.UUID": ignite_types.UUID,
+    # GEOMETRY
+    "org.locationtech.jts.geom.Geometry": ignite_types.GEOMETRY,
+    "com.vividsolutions.jts.geom.Geometry": ignite_types.GEOMETRY,
+    # OTHER
+    "java.lang.Object": ignite_types.OTHER,
 }
 
 
-def _resolve_type(col_type):
-    return TYPES_MAP.get(col_type, sqltypes.UserDefinedType)
+def _resolve_type(col_type, precision=-1, scale=-1):
+
+    if col_type in TYPES_MAP:
+        type_ = TYPES_MAP[col_type]
+    elif col_type and col_type.endswith("[]"):
+        type_ = ignite_types.ARRAY
+    else:
+        type_ = ignite_types.OTHER
+
+    precision = precision if precision and precision > 0 else None
+    scale = scale if scale and scale >= 0 else None
+
+    if precision and type_ is sqltypes.DECIMAL:
+        return sqltypes.DECIMAL(precision=precision, scale=scale)
+
+    if precision and type_ in (sqltypes.String, sqltypes.CHAR):
+        return type_(length=precision)
+
+    return type_
 
 
 """
@@ -81,16 +112,84 @@ def _create_column_info(row):
     nullable = True if row[4] == "true" else False
     return {
         'name': row[0],
-        'type': _resolve_type(row[2]),
+        'type': _resolve_type(row[2], row[5], row[6]),
         'nullable': nullable
     }
 
 
+class IgniteTypeCompiler(GenericTypeCompiler):
+    """
+    DDL names of the Apache Ignite specific types; ARRAY and OTHER
+    are accepted by the H2-based SQL engine only
+    """
+
+    def visit_TINYINT(self, type_, **kw):
+        return "TINYINT"
+
+    def visit_DOUBLE(self, type_, **kw):
+        return "DOUBLE"
+
+    def visit_REAL(self, type_, **kw):
+        return "REAL"
+
+    def visit_UUID(self, type_, **kw):
+        return "UUID"
+
+    def visit_ARRAY(self, type_, **kw):
+        return "ARRAY"
+
+    def visit_GEOMETRY(self, type_, **kw):
+        return "GEOMETRY"
+
+    def visit_OTHER(self, type_, **kw):
+        return "OTHER"
+
+
+class IgniteInspector(reflection.Inspector):
+    """
+    Inspector with Apache Ignite specific extensions
+    """
+
+    def get_table_stats(self, table_name, schema=None):
+        """
+        Estimate the row count and partition distribution of a
+        table, e.g. to size previews and paginators
+        """
+        return self.dialect.get_table_stats(self.bind, table_name, schema,
+                                            info_cache=self.info_cache)
+
+
 class IgniteDialect(DefaultDialect, ABC):
     name = 'igniteworks'
-
-    def __init__(self, *args, **kwargs):
+    """
+    pyignite decodes Java BigDecimal values as decimal.Decimal;
+    numeric results therefore need no conversion
+    """
+    supports_native_decimal = True
+
+    inspector = IgniteInspector
+    """
+    SQLAlchemy 2.x uses `type_compiler_cls`, SQLAlchemy 1.x
+    `type_compiler`
+    """
+    type_compiler_cls = IgniteTypeCompiler
+    type_compiler = IgniteTypeCompiler
+
+    def __init__(self, schema_snapshot=None, write_behind=None, *args, **kwargs):
         super(IgniteDialect, self).__init__(*args, **kwargs)
+        """
+        The (optional) path of a local schema snapshot file; it is
+        loaded at engine creation and shared by all connections
+        """
+        self.schema_snapshot = schema_snapshot
+        if schema_snapshot:
+            from igniteworks.client.schema import SchemaSnapshot
+            SchemaSnapshot.open(schema_snapshot)
+        """
+        Opt-in write-behind buffering of the INSERT and MERGE
+        statements of all connections
+        """
+        self.write_behind = write_behind
 
     @classmethod
     def dbapi(cls):
@@ -104,11 +203,60 @@ class IgniteDialect(DefaultDialect, ABC):
             server = '{0}:{1}'.format(host, port or '10800')
         if 'servers' in kwargs:
             server = kwargs.pop('servers')
+        if self.schema_snapshot:
+            kwargs.setdefault('schema_snapshot', self.schema_snapshot)
+        if self.write_behind is not None:
+            kwargs.setdefault('write_behind', self.write_behind)
         if server:
             return self.dbapi.connect(servers=server, **kwargs)
 
         return self.dbapi.connect(**kwargs)
 
+    def is_disconnect(self, e, connection, cursor):
+        """
+        Connection failures (including an open circuit) invalidate
+        the pooled connection
+        """
+        from igniteworks.client.exceptions import IgniteConnectionError
+        return isinstance(e, IgniteConnectionError)
+
+    def explain(self, connection, stmt, parameters=None):
+        """
+        Retrieve the query plan of a statement (SQL string or
+        SQLAlchemy construct) as QueryPlan; full scans and
+        filtered tables without index usage are flagged
+        """
+        if not isinstance(stmt, str):
+            compiled = stmt.compile(dialect=self, compile_kwargs={"render_postcompile": True})
+            stmt, parameters = str(compiled), compiled.params
+
+        with connection.connection.checkout() as context:
+            return context.explain(stmt, parameters)
+
+    @staticmethod
+    def _apply_profile(cursor, context):
+        """
+        The `ignite_profile` execution option (a file path, True or
+        False) overrides the profile target of the connection
+        """
+        if context is not None and "ignite_profile" in context.execution_options:
+            cursor.profile = context.execution_options["ignite_profile"]
+
+    def do_execute(self, cursor, statement, parameters, context=None):
+
+        self._apply_profile(cursor, context)
+        super(IgniteDialect, self).do_execute(cursor, statement, parameters, context)
+
+    def do_executemany(self, cursor, statement, parameters, context=None):
+
+        self._apply_profile(cursor, context)
+        super(IgniteDialect, self).do_executemany(cursor, statement, parameters, context)
+
+    def do_execute_no_params(self, cursor, statement, context=None):
+
+        self._apply_profile(cursor, context)
+        super(IgniteDialect, self).do_execute_no_params(cursor, statement, context)
+
     def do_rollback(self, connection):
         # if any exception is raised by the dbapi, sqlalchemy by default
         # attempts to do a rollback. Apache Ignite supports transactions,
@@ -169,6 +317,47 @@ class IgniteDialect(DefaultDialect, ABC):
 
         return [row[0] for row in tables]
 
+    def has_schema(self, connection, schema_name, **kw):
+        """
+        Check whether a schema (cache name) exists
+        """
+        cursor = connection.execute("HAS SCHEMA " + schema_name)
+        return bool(cursor.fetchone()[0])
+
+    def has_table(self, connection, table_name, schema=None, **kw):
+        """
+        Check whether a table exists without listing all tables
+        """
+        sql = "HAS TABLE " + table_name
+        if schema:
+            sql += " WITH " + schema
+
+        cursor = connection.execute(sql)
+        return bool(cursor.fetchone()[0])
+
+    def has_index(self, connection, table_name, index_name, schema=None, **kw):
+        """
+        Check whether an index of a certain table exists
+        """
+        sql = "HAS INDEX " + index_name + " ON " + table_name
+        if schema:
+            sql += " WITH " + schema
+
+        cursor = connection.execute(sql)
+        return bool(cursor.fetchone()[0])
+
+    def get_table_stats(self, connection, table_name, schema=None, **kw):
+        """
+        Estimate the row count and partition distribution of a
+        table from its cache sizes, without a COUNT(*) scan
+        """
+        sql = "GET STATS FROM " + table_name
+        if schema:
+            sql += " WITH " + schema
+
+        cursor = connection.execute(sql)
+        return dict(zip(cursor.keys(), cursor.fetchone()))
+
     @reflection.cache
     def get_pk_constraint(self, connection, table_name, schema=None, **kw):
         """
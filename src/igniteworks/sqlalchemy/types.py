@@ -16,6 +16,8 @@
 #
 # @author Stefan Krusche, Dr. Krusche & Partner PartG
 #
+import uuid
+
 from sqlalchemy.sql import sqltypes
 
 
@@ -23,6 +25,75 @@ class TINYINT(sqltypes.TypeEngine):
 
     @property
     def python_type(self):
-        pass
+        return int
 
     __visit_name__ = "TINYINT"
+
+
+class DOUBLE(sqltypes.Float):
+    """
+    Java double values are decoded by pyignite as Python floats;
+    no result processing is required
+    """
+
+    def result_processor(self, dialect, coltype):
+        if self.asdecimal:
+            return super(DOUBLE, self).result_processor(dialect, coltype)
+        return None
+
+    __visit_name__ = "DOUBLE"
+
+
+class REAL(DOUBLE):
+
+    __visit_name__ = "REAL"
+
+
+class UUID(sqltypes.TypeEngine):
+    """
+    Java UUID values are decoded by pyignite as uuid.UUID
+    """
+
+    @property
+    def python_type(self):
+        return uuid.UUID
+
+    __visit_name__ = "UUID"
+
+
+class ARRAY(sqltypes.TypeEngine):
+    """
+    Java arrays (e.g. int[], java.lang.String[]) are decoded
+    by pyignite as Python lists
+    """
+
+    @property
+    def python_type(self):
+        return list
+
+    __visit_name__ = "ARRAY"
+
+
+class GEOMETRY(sqltypes.TypeEngine):
+    """
+    Spatial geometry values (JTS); they are passed through in
+    the representation provided by pyignite
+    """
+
+    @property
+    def python_type(self):
+        return object
+
+    __visit_name__ = "GEOMETRY"
+
+
+class OTHER(sqltypes.TypeEngine):
+    """
+    Java types without a specific SQL representation
+    """
+
+    @property
+    def python_type(self):
+        return object
+
+    __visit_name__ = "OTHER"
@@ -0,0 +1,125 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import json
+import threading
+
+import pytest
+
+from igniteworks import bench
+
+
+class StubTarget(object):
+    """
+    Records the replayed statements instead of sending them
+    """
+    instances = []
+
+    def __init__(self, target, options=None):
+        self.connections = 1
+        self.executed = []
+        self._lock = threading.Lock()
+        StubTarget.instances.append(self)
+
+    def execute(self, sql, parameters, many=False):
+        if sql.startswith("FAIL"):
+            raise ValueError(sql)
+        with self._lock:
+            self.executed.append((sql, parameters, many))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stub_target(monkeypatch):
+    StubTarget.instances = []
+    monkeypatch.setattr(bench, "Target", StubTarget)
+    return StubTarget
+
+
+def _write(path, lines):
+    path.write_text("\n".join(json.dumps(line) if isinstance(line, dict) else line
+                              for line in lines), encoding="utf-8")
+    return str(path)
+
+
+def test_load_workload(tmp_path):
+    path = _write(tmp_path / "workload.jsonl", [
+        {"sql": "SELECT * FROM t WHERE id = %s", "parameters": [1]},
+        {"sql": "INSERT INTO t VALUES (%s, %s)", "parameters": [[1, "a"], [2, "b"]]},
+        {"sql": "SELECT * FROM t WHERE id = ?", "stages": {}},
+        {"sql": "SELECT '?' FROM t"},
+        "SELECT 1",
+        "",
+        {"duration_ms": 1.0},
+    ])
+
+    workload, skipped = bench.load_workload(path)
+
+    assert workload == [
+        ("SELECT * FROM t WHERE id = %s", [1], False),
+        ("INSERT INTO t VALUES (%s, %s)", [[1, "a"], [2, "b"]], True),
+        ("SELECT '?' FROM t", None, False),
+        ("SELECT 1", None, False),
+    ]
+    assert skipped == ["SELECT * FROM t WHERE id = ?"]
+
+
+def test_percentile():
+    values = list(range(1, 101))
+
+    assert bench.percentile([], 50) is None
+    assert bench.percentile(values, 50) == 50
+    assert bench.percentile(values, 99) == 99
+    assert bench.percentile(values, 99.9) == 100
+    assert bench.percentile([7], 99.9) == 7
+
+
+@pytest.mark.parametrize("mode", ["thread", "async"])
+def test_replay(stub_target, mode):
+    workload = [
+        ("SELECT 1", None, False),
+        ("INSERT INTO t VALUES (%s)", [[1], [2]], True),
+        ("FAIL", None, False),
+    ]
+
+    report = bench.replay("127.0.0.1:10800", workload, workers=2, mode=mode, iterations=3)
+
+    assert report["statements"] == 9
+    assert report["errors"] == 3
+    assert report["error_types"] == {"ValueError": 3}
+    assert report["connections"] == 1
+    assert report["latency_ms"]["p50"] is not None
+
+    executed = stub_target.instances[0].executed
+    assert len(executed) == 6
+    assert executed.count(("INSERT INTO t VALUES (%s)", [[1], [2]], True)) == 3
+
+
+@pytest.mark.parametrize("option, expected", [
+    ("page_size=4096", ("page_size", 4096)),
+    (" timeout = 2.5 ", ("timeout", 2.5)),
+    ("use_ssl=true", ("use_ssl", True)),
+    ("spill_threshold=null", ("spill_threshold", None)),
+    ("username=ignite", ("username", "ignite")),
+    ('schema="PUBLIC"', ("schema", "PUBLIC")),
+])
+def test_parse_option(option, expected):
+    assert bench.parse_option(option) == expected
@@ -0,0 +1,145 @@
+# -*- coding: utf-8; -*-
+#
+# Copyright (c) 2020 - 2021 Dr. Krusche & Partner PartG. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+#
+# @author Stefan Krusche, Dr. Krusche & Partner PartG
+#
+
+import pytest
+
+from igniteworks.client import federation
+from igniteworks.client.buffer import PagedRows
+from igniteworks.client.exceptions import NotSupportedError
+
+
+class StubContext(object):
+    """
+    Answers every query with the same rows
+    """
+
+    def __init__(self, rows, cols=("ID", "NAME"), paged=False):
+        self.rows = rows
+        self.cols = list(cols)
+        self.paged = paged
+        self.results = []
+        self.statements = []
+
+    def sql(self, stmt, parameters=None, bulk_parameters=None):
+        self.statements.append((stmt, parameters))
+        rows = PagedRows(iter(self.rows), page_size=1) if self.paged else list(self.rows)
+        self.results.append(rows)
+        return {'cols': self.cols, 'rows': rows}
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("stmt, parameters, expected", [
+    ("SELECT * FROM t", None, ("SELECT * FROM t", None, None, 0)),
+    ("SELECT * FROM t LIMIT 10", None, ("SELECT * FROM t LIMIT 10", None, 10, 0)),
+    ("SELECT * FROM t LIMIT 10 OFFSET 5", None, ("SELECT * FROM t LIMIT 15", None, 10, 5)),
+    ("SELECT * FROM t WHERE a = %s LIMIT %s OFFSET %s", [1, 10, 5],
+     ("SELECT * FROM t WHERE a = %s LIMIT 15", [1], 10, 5)),
+    ("SELECT * FROM t LIMIT %(limit)s", {"limit": 3}, ("SELECT * FROM t LIMIT 3", {"limit": 3}, 3, 0)),
+])
+def test_push_down_limit(stmt, parameters, expected):
+    assert federation.push_down_limit(stmt, parameters) == expected
+
+
+def test_push_down_limit_removed():
+    assert federation.push_down_limit("SELECT * FROM t LIMIT 10 OFFSET 5", push_down=False) == \
+        ("SELECT * FROM t", None, 10, 5)
+
+
+def test_order_key():
+    cols = ["ID", "NAME"]
+    rows = [(2, "b"), (1, None), (3, "a"), (None, "c")]
+
+    key = federation.order_key("SELECT id, name FROM t ORDER BY t.id", cols)
+    assert sorted(rows, key=key) == [(None, "c"), (1, None), (2, "b"), (3, "a")]
+
+    key = federation.order_key("SELECT id, name FROM t ORDER BY 2 DESC, id LIMIT 3", cols)
+    assert sorted(rows, key=key) == [(None, "c"), (2, "b"), (3, "a"), (1, None)]
+
+    assert federation.order_key("SELECT id, name FROM t", cols) is None
+    assert federation.order_key("SELECT id, name FROM t ORDER BY LOWER(name)", cols) is None
+
+
+def test_aggregation():
+    assert federation.aggregation("SELECT id, name FROM t") is None
+    assert federation.aggregation("SELECT COUNT(*), MAX(id) AS m FROM t") == ["COUNT", "MAX"]
+    assert federation.aggregation("SELECT name, SUM(id) FROM t GROUP BY name") == [None, "SUM"]
+
+    for stmt in ["SELECT AVG(id) FROM t",
+                 "SELECT COUNT(DISTINCT id) FROM t",
+                 "SELECT name, COUNT(*) FROM t GROUP BY name HAVING COUNT(*) > 1",
+                 "SELECT name, COUNT(*) FROM t"]:
+        with pytest.raises(NotSupportedError):
+            federation.aggregation(stmt)
+
+
+def test_reaggregate():
+    functions = [None, "COUNT", "SUM", "MIN", "MAX"]
+    results = [
+        [("a", 1, 10, 5, 5), ("b", 2, None, 1, 1)],
+        [("a", 3, 20, 2, 9), ("c", 1, 1, None, None)],
+    ]
+
+    assert sorted(federation.reaggregate(functions, results)) == [
+        ("a", 4, 30, 2, 9),
+        ("b", 2, None, 1, 1),
+        ("c", 1, 1, None, None),
+    ]
+
+
+def test_sql_merges_materialized_results():
+    contexts = [StubContext([(1, "a"), (4, "d")]), StubContext([(2, "b"), (3, "c")])]
+    context = federation.FederatedContext([("eu", contexts[0]), ("us", contexts[1])])
+    try:
+        response = context.sql("SELECT id, name FROM t ORDER BY id LIMIT 2 OFFSET 1")
+    finally:
+        context.close()
+
+    assert response == {'cols': ["ID", "NAME"], 'rows': [(2, "b"), (3, "c")]}
+    assert contexts[0].statements == [("SELECT id, name FROM t ORDER BY id LIMIT 3", None)]
+
+
+def test_sql_streams_paged_results():
+    contexts = [StubContext([(1, "a"), (4, "d")], paged=True), StubContext([(2, "b"), (3, "c")], paged=True)]
+    context = federation.FederatedContext([("eu", contexts[0]), ("us", contexts[1])], page_size=2)
+    try:
+        response = context.sql("SELECT id, name FROM t ORDER BY id")
+    finally:
+        context.close()
+
+    rows = response['rows']
+    assert isinstance(rows, PagedRows)
+    assert rows[0] == (1, "a")
+
+    rows.close()
+    assert all(result.exhausted for stub in contexts for result in stub.results)
+
+
+def test_sql_reaggregates():
+    contexts = [StubContext([("a", 1), ("b", 2)], cols=("NAME", "COUNT")),
+                StubContext([("a", 3)], cols=("NAME", "COUNT"))]
+    context = federation.FederatedContext([("eu", contexts[0]), ("us", contexts[1])])
+    try:
+        response = context.sql("SELECT name, COUNT(*) FROM t GROUP BY name ORDER BY 2 DESC LIMIT 1")
+    finally:
+        context.close()
+
+    assert response['rows'] == [("a", 4)]
+    assert contexts[0].statements == [("SELECT name, COUNT(*) FROM t GROUP BY name ORDER BY 2 DESC", None)]